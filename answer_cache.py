@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+# default number of answers kept in memory
+DEFAULT_CACHE_SIZE = 4096
+
+
+def ontology_fingerprint(ontology_path):
+    """
+    :param ontology_path: path of the ontology N-Triples file
+    :return: hex sha256 of the file, the version answers are cached for;
+    the snapshot and the index record it too, to tell they are stale
+    """
+    digest = hashlib.sha256()
+    with open(ontology_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    """
+    bounded LRU cache of formatted answers, keyed on the
+    (query_key, query_arg) pair returned by parse_query. The
+    cache belongs to one ontology version, identified by its
+    fingerprint (the sha256 of ontology.nt); answers saved for
+    another fingerprint are dropped when loaded.
+    """
+
+    def __init__(self, fingerprint, max_size=DEFAULT_CACHE_SIZE):
+        self.fingerprint = fingerprint
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :param key: (query_key, query_arg) tuple
+        :return: cached (status, response), or None on a miss
+        """
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        :param key: (query_key, query_arg) tuple
+        :param value: (status, response) tuple
+        """
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)  # least recently used
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
+
+    def load(self, cache_path):
+        """
+        load answers saved by a previous run, unless they were
+        answered from a different version of the ontology.
+        :return: number of answers loaded
+        """
+        if not os.path.isfile(cache_path):
+            return 0
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except ValueError:
+            return 0
+        if saved.get('fingerprint') != self.fingerprint:
+            return 0
+        for query_key, query_arg, status, response in saved['entries'][-self.max_size:]:
+            self.put((query_key, query_arg), (status, response))
+        return len(self.entries)
+
+    def save(self, cache_path):
+        """
+        save the answers, least recently used first.
+        """
+        with self.lock:
+            entries = [[k[0], k[1], v[0], v[1]] for k, v in self.entries.items()]
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            json.dump({'fingerprint': self.fingerprint, 'entries': entries}, out)
+        os.replace(tmp_path, cache_path)
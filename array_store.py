@@ -0,0 +1,122 @@
+from rdflib import Graph, URIRef, Literal, BNode
+from rdflib.store import Store
+from ontology_index import open_index, encode_term, LITERAL_SEPARATOR
+
+
+def _decode_key(key):
+    kind, value = key[0], key[1:]
+    if kind == 'U':
+        return URIRef(value)
+    if kind == 'L':
+        lexical, extra = value.split(LITERAL_SEPARATOR, 1)
+        if extra.startswith('@'):
+            return Literal(lexical, lang=extra[1:])
+        return Literal(lexical, datatype=URIRef(extra) if extra else None)
+    return BNode(value)
+
+
+class ArrayStore(Store):
+    """
+    read-only rdflib store over an OntologyIndex: every term is an
+    integer id, and the triples are the index's SPO, POS and OSP
+    sorted id arrays. A triple pattern is answered by a binary
+    search in the array whose order starts with its bound terms,
+    so Graph.query and the SPARQL templates run unchanged on it.
+    terms are decoded to rdflib objects once, when first returned.
+    """
+
+    context_aware = False
+    formula_aware = False
+    graph_aware = False
+    transaction_aware = False
+
+    def __init__(self, index):
+        super(ArrayStore, self).__init__()
+        self.index = index
+        self.terms = {}  # term id -> decoded rdflib term
+        self.ids = {}  # rdflib term -> term id, or None if not in the index
+        self._namespaces = {}
+        self._prefixes = {}
+
+    def _term(self, term_id):
+        term = self.terms.get(term_id)
+        if term is None:
+            term = self.terms[term_id] = _decode_key(self.index.key(term_id))
+        return term
+
+    def _id(self, term):
+        if term in self.ids:
+            return self.ids[term]
+        term_id = self.ids[term] = self.index.term_id(encode_term(term))
+        return term_id
+
+    def triples(self, triple_pattern, context=None):
+        bound = {}
+        for position, term in enumerate(triple_pattern):
+            if term is not None:
+                term_id = self._id(term)
+                if term_id is None:
+                    return
+                bound[position] = term_id
+        if len(bound) == 3:
+            # a fully bound pattern only asks whether the triple is there
+            if self.index.contains((bound[0], bound[1], bound[2])):
+                yield triple_pattern, iter(())
+            return
+
+        # the order whose leading positions are the bound ones
+        if 0 in bound:
+            order = 'osp' if 2 in bound and 1 not in bound else 'spo'
+        elif 1 in bound:
+            order = 'pos'
+        else:
+            order = 'osp' if 2 in bound else 'spo'
+        positions = {'spo': (0, 1, 2), 'pos': (1, 2, 0), 'osp': (2, 0, 1)}[order]
+        prefix = []
+        for position in positions:
+            if position not in bound:
+                break
+            prefix.append(bound[position])
+
+        for row in self.index.rows(order, tuple(prefix)):
+            ids = [0, 0, 0]
+            for position, term_id in zip(positions, row):
+                ids[position] = term_id
+            yield (self._term(ids[0]), self._term(ids[1]), self._term(ids[2])), iter(())
+
+    def __len__(self, context=None):
+        return self.index.n_triples
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def add(self, triple, context, quoted=False):
+        raise TypeError("ArrayStore is read-only")
+
+    def remove(self, triple, context=None):
+        raise TypeError("ArrayStore is read-only")
+
+    def bind(self, prefix, namespace, override=True):
+        if not override and (prefix in self._namespaces or namespace in self._prefixes):
+            return
+        self._namespaces[prefix] = namespace
+        self._prefixes[namespace] = prefix
+
+    def namespace(self, prefix):
+        return self._namespaces.get(prefix)
+
+    def prefix(self, namespace):
+        return self._prefixes.get(namespace)
+
+    def namespaces(self):
+        for prefix, namespace in self._namespaces.items():
+            yield prefix, namespace
+
+
+def load_array_graph(nt_path):
+    """
+    :param nt_path: path of the N-Triples file
+    :return: rdflib graph backed by an ArrayStore over the memory
+    mapped index of nt_path, written first if missing or stale
+    """
+    return Graph(store=ArrayStore(open_index(nt_path)))
@@ -0,0 +1,173 @@
+"""
+fuzz and benchmark the question classifier of question_classifier.py
+against the nine sequential regexes parse_query used before it.
+  - agreement on a corpus of well formed and random questions. The
+    expected differences are bugs of the old extraction: birthday
+    questions kept only the words after the last 'of' and dropped
+    'born' anywhere, spaces before the '?' became a trailing '_',
+    and 'who' questions were not anchored at the end
+  - latency on adversarial inputs of growing length, that almost
+    match a template and make the old regexes backtrack
+  - a linear scaling check: fails if doubling the input length
+    more than (roughly) doubles the classifier time
+no ontology or network needed:
+    python benchmarks/bench_classifier.py --max-length 20000 --fuzz 20000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_classifier import parse_query, normalize_text
+
+
+# the regexes and entity extraction of parse_query before the classifier
+OLD_PATTERNS = [
+    ("presi", r"^Who(\s+)is(\s+)the(\s+)president(\s+)of(\s+\w+)+(\s*)(\?+)(\s*)$",
+     lambda q: re.split(r"president(\s+)of(\s+)", q)[-1].replace("?", "")),
+    ("prime", r"^Who(\s+)is(\s+)the(\s+)prime(\s+)minister(\s+)of(\s+\w+)+(\s*)(\?+)(\s*)$",
+     lambda q: re.split(r"prime(\s+)minister(\s+)of(\s+)", q)[-1].replace("?", "")),
+    ("popul", r"^What(\s+)is(\s+)the(\s+)population(\s+)of(\s+\w+)+(\s*)(\?+)$",
+     lambda q: re.split(r"population(\s+)of(\s+)", q)[-1]),
+    ("area", r"^What(\s+)is(\s+)the(\s+)area(\s+)of(\s+\w+)+(\s*)(\?+)(\s*)$",
+     lambda q: re.split(r"area(\s+)of(\s+)", q)[-1]),
+    ("gov", r"^What(\s+)is(\s+)the(\s+)government(\s+)of(\s+\w+)+(\s*)(\?+)(\s*)$",
+     lambda q: re.split(r"government(\s+)of(\s+)", q)[-1]),
+    ("capital", r"^What(\s+)is(\s+)the(\s+)capital(\s+)of(\s+\w+)+(\s*)(\?+)(\s*)$",
+     lambda q: re.split(r"capital(\s+)of(\s+)", q)[-1]),
+    ("presi_bday", r"^When(\s+)was(\s+)the(\s+)president(\s+)of((\s\w+)+)(\s)born(\s*)(\?+)(\s*)$",
+     lambda q: re.split(r"of(\s+)", q.replace("born", "").replace("?", ""))[-1]),
+    ("prime_bday", r"^When(\s+)was(\s+)the(\s+)prime(\s+)minister(\s+)of((\s\w+)+)(\s)born(\s*)(\?+)(\s*)$",
+     lambda q: re.split(r"of(\s+)", q.replace("born", "").replace("?", ""))[-1]),
+    ("who", r"^Who(\s+)is(\s+)(\w+)(\s*)(\w*)(\s*)(\?+)(\s*)",
+     lambda q: re.sub(r"Who(\s+)is(\s+)", "", q).replace("?", "")),
+]
+
+
+def old_parse_query(query):
+    for query_key, pattern, extract in OLD_PATTERNS:
+        if re.match(pattern, query):
+            return query_key, normalize_text(extract(query))
+    return None, None
+
+
+QUESTION_TEMPLATES = ["Who is the president of {}?",
+                      "Who is the prime minister of {}?",
+                      "What is the population of {}?",
+                      "What is the area of {}?",
+                      "What is the government of {}?",
+                      "What is the capital of {}?",
+                      "When was the president of {} born?",
+                      "When was the prime minister of {} born?",
+                      "Who is {}?"]
+ENTITIES = ["France", "United States", "Isle of Man", "Bosnia and Herzegovina",
+            "Guinea-Bissau", "Cote d'Ivoire", "Emmanuel Macron", "Boris", "Réunion", "Niger"]
+
+
+# adversarial inputs: n -> question of length about n, almost
+# matching a template but failing at its very end. All of them end
+# with "?", so they are tokenized and every word is checked before
+# the entity (or the missing "born") rejects them.
+ADVERSARIAL = {
+    'who, one long word': lambda n: "Who is " + "a" * n + "-?",
+    'who, many words': lambda n: "Who is " + "a " * (n // 2) + "?",
+    'who, long run of spaces': lambda n: "Who is a" + " " * n + "-?",
+    'president, many words': lambda n: "Who is the president of" + " a" * (n // 2) + " -?",
+    'birthday, no born': lambda n: "When was the president of" + " a" * (n // 2) + "?",
+    'population, tabs and words': lambda n: "What is the population of" + " \t a" * (n // 4) + " -?",
+    'question marks': lambda n: "Who is the president of -" + "?" * n,
+}
+
+
+def fuzz_question(rng):
+    # well formed questions with random entities, and random edits of them
+    words = ["Who", "is", "the", "president", "prime", "minister", "of", "What",
+             "population", "When", "was", "born", "France", "?", "!", "-", "a", "\t", "  "]
+    if rng.random() < 0.5:
+        entity = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+        return rng.choice(QUESTION_TEMPLATES).format(entity)
+    return ' '.join(rng.choice(words) for _ in range(rng.randint(1, 12)))
+
+
+def agreement(questions):
+    differences = 0
+    for question in questions:
+        old, new = old_parse_query(question), parse_query(question)
+        if old != new:
+            differences += 1
+            if differences <= 10:
+                print("  differs: {!r} | old: {} | new: {}".format(question, old, new))
+    return differences
+
+
+def best_time(func, arg, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='question classifier fuzz and benchmark')
+    parser.add_argument("--max-length", type=int, default=16000)
+    parser.add_argument("--old-max-length", type=int, default=4000,
+                        help="longest adversarial input given to the old regexes")
+    parser.add_argument("--fuzz", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = [t.format(e) for t in QUESTION_TEMPLATES for e in ENTITIES]
+    print("corpus: {} questions, {} differ from the old parser".format(len(corpus), agreement(corpus)))
+
+    rng = random.Random(args.seed)
+    fuzzed = [fuzz_question(rng) for _ in range(args.fuzz)]
+    print("fuzz: {} questions, {} differ from the old parser".format(len(fuzzed), agreement(fuzzed)))
+
+    start = time.perf_counter()
+    for question in corpus:
+        parse_query(question)
+    new_us = 1e6 * (time.perf_counter() - start) / len(corpus)
+    start = time.perf_counter()
+    for question in corpus:
+        old_parse_query(question)
+    old_us = 1e6 * (time.perf_counter() - start) / len(corpus)
+    print("well formed questions: old {:.1f} us, new {:.1f} us per question".format(old_us, new_us))
+
+    failures = 0
+    for name, make_question in ADVERSARIAL.items():
+        print(name)
+        previous = None
+        length = 1000
+        while length <= args.max_length:
+            question = make_question(length)
+            if parse_query(question) != (None, None):
+                failures += 1
+                print("  not rejected: n={}".format(length))
+            new_time = best_time(parse_query, question)
+            line = "  n={:<7} new {:9.3f} ms".format(length, 1e3 * new_time)
+            if length <= args.old_max_length:
+                line += "   old {:9.3f} ms".format(1e3 * best_time(old_parse_query, question, repeat=1))
+            print(line)
+            # doubling n may at most (about) double the time; the
+            # slack absorbs timer noise on the small inputs
+            if previous is not None and new_time > 3 * previous + 1e-4:
+                failures += 1
+                print("  not linear: {:.3f} ms after {:.3f} ms".format(1e3 * new_time, 1e3 * previous))
+            previous = new_time
+            length *= 2
+
+    if failures:
+        print("FAIL: {} superlinear steps".format(failures))
+        sys.exit(1)
+    print("ok")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+compare the per-country cost of the old infobox extraction, six
+separate descendant:: xpath scans reparsed on every call, with the
+single pass row index of infobox.py plus compiled row xpaths. Also
+compares parsing the whole article with the streaming parse that
+stops after the infobox.
+runs on pages saved in a page cache, no network needed; by default
+on the fixture pages benchmarks/fixtures/make_fixtures.py writes to
+a temporary directory, plus the real pages create saved in .wiki_cache
+if there is one, so that the two extractions are also checked to agree
+on markup the fixtures don't reproduce:
+    python benchmarks/bench_infobox.py
+    python benchmarks/bench_infobox.py --cache-dir .wiki_cache
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks", "fixtures"))
+
+from lxml import html
+from infobox import parse_first_element, is_infobox
+from infobox import index_infobox_rows, ROW_FIRST_TD_LINK, ROW_NESTED_TD_LINK, ROW_CAPITAL_LINK
+from infobox import ROW_FIRST_TD_TEXT, ROW_TD_TEXTS, ROW_TD_NODES
+from wiki_fetch import PageCache, DEFAULT_CACHE_DIR
+
+
+# the expressions get_country_info used before the row index
+OLD_XPATHS = {
+    'population': "descendant::tr[descendant::*[contains(text(), 'Population')]]/following::tr[1]/td//text()[1]",
+    'prime': "descendant::tr[descendant::*[contains(text(), 'Prime Minister')]][1]/td[1]//a[1]",
+    'president': "descendant::tr[descendant::*[text()='President']][1]//td[1]//a[1]",
+    'capital': "descendant::tr[th[contains(text(), 'Capital')]][1]//a[not(contains(@class, 'external')) and not(contains(@href, 'endnote'))][1]",
+    'area': "descendant::tr[contains(th//text(), 'Total')][1]/td[1]/text()[1]",
+    'government': "descendant::tr[descendant::a[contains(text(), 'Government')] or descendant::th[contains(text(), 'Government')]]/td//node()",
+}
+
+
+def old_extract(infobox):
+    return {field: infobox.xpath(xpath) for field, xpath in OLD_XPATHS.items()}
+
+
+def new_extract(infobox):
+    rows = index_infobox_rows(infobox)
+
+    def apply(xpath, label):
+        return xpath(rows[label]) if label in rows else []
+
+    return {'population': apply(ROW_TD_TEXTS, 'population_value'),
+            'prime': apply(ROW_FIRST_TD_LINK, 'prime_minister'),
+            'president': apply(ROW_NESTED_TD_LINK, 'president'),
+            'capital': apply(ROW_CAPITAL_LINK, 'capital'),
+            'area': apply(ROW_FIRST_TD_TEXT, 'total'),
+            'government': [n for row in rows['government'] for n in ROW_TD_NODES(row)]}
+
+
+def first_value(result):
+    """
+    compare results by the first hit only, which is all the
+    extractors of get_country_info use (government uses all).
+    """
+    if not result:
+        return None
+    first = result[0]
+    return first if isinstance(first, str) else html.tostring(first)
+
+
+def load_pages(cache_dir):
+    cache = PageCache(cache_dir, offline=True)
+    pages = []
+    for entry_path in sorted(glob.glob(os.path.join(cache_dir, 'urls', '*.json'))):
+        with open(entry_path) as f:
+            url = json.load(f)['url']
+        _, body = cache.lookup(url)
+        if body is not None:
+            pages.append((url, body))
+    return pages
+
+
+def full_parse(body):
+    found = html.fromstring(body).xpath("//table[contains(@class, 'infobox')][1]")
+    return found[0] if found else None
+
+
+def time_parse(parse, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, body in pages:
+            parse(body)
+    return (time.perf_counter() - start) / (repeat * len(pages))
+
+
+def time_extract(extract, infoboxes, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, infobox in infoboxes:
+            extract(infobox)
+    return (time.perf_counter() - start) / (repeat * len(infoboxes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='infobox extraction benchmark')
+    parser.add_argument("--cache-dir", type=str, default="",
+                        help="page cache (default: generated fixtures, and .wiki_cache if present)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.cache_dir:
+        pages = load_pages(args.cache_dir)
+        print("{} pages from {}".format(len(pages), args.cache_dir))
+    else:
+        import make_fixtures
+        with tempfile.TemporaryDirectory() as fixtures_dir:
+            cache_dir = os.path.join(fixtures_dir, "wiki_cache")
+            make_fixtures.build(cache_dir, os.path.join(fixtures_dir, "country_info.jsonl"))
+            pages = load_pages(cache_dir)
+        print("{} pages from the generated fixtures".format(len(pages)))
+        if os.path.isdir(DEFAULT_CACHE_DIR):
+            real_pages = load_pages(DEFAULT_CACHE_DIR)
+            print("{} pages from {}".format(len(real_pages), DEFAULT_CACHE_DIR))
+            pages += real_pages
+        else:
+            print("no {} here: the extractions are only compared on the fixtures".format(DEFAULT_CACHE_DIR))
+    infoboxes = [(url, full_parse(body)) for url, body in pages]
+    infoboxes = [(url, infobox) for url, infobox in infoboxes if infobox is not None]
+    if not infoboxes:
+        print("no cached pages with an infobox")
+        exit(1)
+
+    # both paths must agree before their speed means anything
+    mismatches = 0
+    for url, body in pages:
+        old_box, new_box = full_parse(body), parse_first_element(body, is_infobox)
+        if (old_box is None) != (new_box is None) or \
+                (old_box is not None and html.tostring(old_box) != html.tostring(new_box)):
+            mismatches += 1
+            print("mismatch: infobox {}".format(url))
+
+    for url, infobox in infoboxes:
+        old, new = old_extract(infobox), new_extract(infobox)
+        for field in OLD_XPATHS:
+            if field == 'government':
+                same = old[field] == new[field]
+            else:
+                same = first_value(old[field]) == first_value(new[field])
+            if not same:
+                mismatches += 1
+                print("mismatch: {} {}".format(field, url))
+
+    old_time = time_extract(old_extract, infoboxes, args.repeat)
+    new_time = time_extract(new_extract, infoboxes, args.repeat)
+    print("pages: {}, mismatches: {}".format(len(infoboxes), mismatches))
+    print("xpath scans: {:.1f} us / page".format(old_time * 1e6))
+    print("row index:   {:.1f} us / page".format(new_time * 1e6))
+    print("speedup:     {:.2f}x".format(old_time / new_time))
+
+    full_time = time_parse(full_parse, pages, args.repeat)
+    stream_time = time_parse(lambda body: parse_first_element(body, is_infobox), pages, args.repeat)
+    print("full parse:      {:.1f} us / page".format(full_time * 1e6))
+    print("streaming parse: {:.1f} us / page".format(stream_time * 1e6))
+    print("speedup:         {:.2f}x".format(full_time / stream_time))
+
+
+if __name__ == '__main__':
+    main()
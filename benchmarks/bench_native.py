@@ -0,0 +1,83 @@
+"""
+compare per-question latency of the native answer path (adjacency
+maps, see geo_query.native_query) with the SPARQL templates, over a
+question corpus generated from the ontology:
+    python benchmarks/bench_native.py --ontology ontology.nt
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo_query import load_ontology, answer_question, uri_name, JOB_URI
+
+
+QUESTION_TEMPLATES = ["Who is the president of {}?",
+                      "Who is the prime minister of {}?",
+                      "What is the population of {}?",
+                      "What is the area of {}?",
+                      "What is the government of {}?",
+                      "What is the capital of {}?",
+                      "When was the president of {} born?",
+                      "When was the prime minister of {} born?"]
+
+
+def question_corpus(ontology):
+    questions = []
+    for name in sorted(ontology.country_index):
+        country = name.replace("_", " ").title()
+        questions.extend(t.format(country) for t in QUESTION_TEMPLATES)
+    for person in sorted(ontology.graph.subjects(JOB_URI, None)):
+        questions.append("Who is {}?".format(uri_name(person).replace("_", " ")))
+    return questions
+
+
+def time_answers(ontology, questions, native):
+    latencies, answers = [], []
+    for question in questions:
+        start = time.perf_counter()
+        answers.append(answer_question(ontology, question, native=native))
+        latencies.append(time.perf_counter() - start)
+    return latencies, answers
+
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    return "mean {:.1f} us, p50 {:.1f} us, p95 {:.1f} us".format(
+        1e6 * sum(ordered) / len(ordered),
+        1e6 * ordered[len(ordered) // 2],
+        1e6 * ordered[int(len(ordered) * 0.95)])
+
+
+def same_answer(a, b):
+    # multi row answers (government, who) have no defined row order
+    return a[0] == b[0] and sorted(a[1].split(", ")) == sorted(b[1].split(", "))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='native vs SPARQL question latency')
+    parser.add_argument("--ontology", type=str, default="ontology.nt")
+    args = parser.parse_args()
+
+    ontology = load_ontology(args.ontology)
+    questions = question_corpus(ontology)
+
+    sparql_latencies, sparql_answers = time_answers(ontology, questions, native=False)
+    native_latencies, native_answers = time_answers(ontology, questions, native=True)
+
+    mismatches = 0
+    for question, a, b in zip(questions, sparql_answers, native_answers):
+        if not same_answer(a, b):
+            mismatches += 1
+            print("mismatch: {} | sparql: {} | native: {}".format(question, a, b))
+
+    print("questions: {}, mismatches: {}".format(len(questions), mismatches))
+    print("sparql: " + summary(sparql_latencies))
+    print("native: " + summary(native_latencies))
+    print("speedup: {:.1f}x".format(sum(sparql_latencies) / sum(native_latencies)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+compare the resident memory and throughput of the pre-fork
+daemon (serve --processes N, workers sharing the memory mapped
+ontology index) with N copies of the threaded daemon, each
+holding its own graph. Memory is the proportional set size
+(shared pages split between the processes sharing them), from
+/proc/<pid>/smaps_rollup, so linux only:
+    python benchmarks/bench_prefork.py --ontology ontology.nt --processes 4
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_server import client, wait_for_socket, summary, COUNTRIES, GEO_QA
+from bench_native import QUESTION_TEMPLATES
+
+
+def pss_kb(pid):
+    with open("/proc/{}/smaps_rollup".format(pid)) as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    return 0
+
+
+def process_tree(pid):
+    pids = [pid]
+    for task in os.listdir("/proc/{}/task".format(pid)):
+        with open("/proc/{}/task/{}/children".format(pid, task)) as f:
+            for child in f.read().split():
+                pids.extend(process_tree(int(child)))
+    return pids
+
+
+def load(socket_paths, clients, questions_per_client, questions):
+    latencies, statuses = [], {}
+    threads = [threading.Thread(target=client, args=(
+        socket_paths[k % len(socket_paths)],
+        [questions[(i + k) % len(questions)] for i in range(questions_per_client)],
+        latencies, statuses)) for k in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+
+def run(name, commands, work_dir, args, questions):
+    daemons = [subprocess.Popen(command, cwd=work_dir, stdout=subprocess.DEVNULL) for command, _ in commands]
+    socket_paths = [socket_path for _, socket_path in commands]
+    try:
+        for socket_path in socket_paths:
+            wait_for_socket(socket_path)
+        latencies, elapsed = load(socket_paths, args.clients, args.questions, questions)
+        pids = [pid for daemon in daemons for pid in process_tree(daemon.pid)]
+        memory_mb = sum(pss_kb(pid) for pid in pids) / 1024
+    finally:
+        for daemon in daemons:
+            daemon.terminate()
+            daemon.wait()
+    print("{}: {} processes, {:.1f} MB pss, {:.0f} questions/s".format(
+        name, len(pids), memory_mb, len(latencies) / elapsed))
+    print("  latency: " + summary(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='pre-fork daemon memory and throughput')
+    parser.add_argument("--ontology", type=str, default="ontology.nt")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--questions", type=int, default=200, help="questions per client")
+    args = parser.parse_args()
+
+    questions = [t.format(c) for c in COUNTRIES for t in QUESTION_TEMPLATES]
+    with tempfile.TemporaryDirectory() as work_dir:
+        for suffix in ('', '.snap', '.idx'):
+            if os.path.isfile(args.ontology + suffix):
+                shutil.copy(args.ontology + suffix, os.path.join(work_dir, "ontology.nt" + suffix))
+
+        threaded = []
+        for i in range(args.processes):
+            socket_path = os.path.join(work_dir, "threaded{}.sock".format(i))
+            threaded.append(([sys.executable, GEO_QA, "serve", "--socket", socket_path], socket_path))
+        run("threaded daemons", threaded, work_dir, args, questions)
+
+        socket_path = os.path.join(work_dir, "prefork.sock")
+        run("pre-fork daemon", [([sys.executable, GEO_QA, "serve", "--socket", socket_path,
+                                  "--processes", str(args.processes)], socket_path)],
+            work_dir, args, questions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+measure the latency and accuracy of the entity resolver of
+entity_resolver.py on misspelled names: the country and people
+names of the ontology, padded with names recombined from their
+words up to --entities, each queried with one random typo
+(substitution, deletion, insertion or transposition). Compares with a scan of
+all the names by edit distance, on the random typos and on the ontology
+names with two adjacent characters swapped (the most common typo, one
+edit that changes the most n-grams). Also asks the questions of
+SHORT_NAME_QUESTIONS, whose short names are one edit away from a
+country but none, which must not be answered. Exits non-zero if the
+resolver misses a transposed name the scan finds, or answers one of
+those questions:
+    python benchmarks/bench_resolver.py --ontology ontology.nt --entities 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entity_resolver import EntityResolver, similarity
+from geo_query import load_ontology, answer_question, MIN_MATCH_CONFIDENCE, MIN_FUZZY_NAME_LENGTH
+from qa_server import ANSWERED
+
+# names shorter than MIN_FUZZY_NAME_LENGTH, one edit from a country:
+# Bali (Mali), Pery (Peru), Chaf (Chad)
+SHORT_NAME_QUESTIONS = ["What is the capital of Bali?", "Who is the president of Pery?",
+                        "What is the population of Chaf?"]
+
+
+def generated_name(words, rng):
+    # a new name made of the words of the ontology names
+    return '_'.join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+
+
+def typo(name, rng):
+    i = rng.randrange(len(name))
+    edit = rng.randrange(4)
+    if edit == 0:
+        return name[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + name[i + 1:]
+    if edit == 1 and len(name) > 1:
+        return name[:i] + name[i + 1:]
+    if edit == 2:
+        return name[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + name[i:]
+    if i + 1 < len(name):
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return name
+
+
+def transposed(name, rng):
+    # swap two adjacent characters, not both the same
+    positions = [i for i in range(len(name) - 1) if name[i] != name[i + 1]]
+    if not positions:
+        return name
+    i = rng.choice(positions)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def scan(names, query):
+    best_name, best_score = None, MIN_MATCH_CONFIDENCE
+    if len(query) < MIN_FUZZY_NAME_LENGTH:
+        return best_name, best_score
+    for name in names:
+        if len(name) < MIN_FUZZY_NAME_LENGTH:
+            continue
+        score = similarity(query, name)
+        if score >= best_score:
+            best_name, best_score = name, score
+    return best_name, best_score
+
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    return "mean {:.1f} us, p50 {:.1f} us, p95 {:.1f} us".format(
+        1e6 * sum(ordered) / len(ordered),
+        1e6 * ordered[len(ordered) // 2],
+        1e6 * ordered[int(len(ordered) * 0.95)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='entity resolver latency and accuracy')
+    parser.add_argument("--ontology", type=str, default="ontology.nt")
+    parser.add_argument("--entities", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--scan-queries", type=int, default=20,
+                        help="queries also answered by scanning all the names")
+    parser.add_argument("--transpositions", type=int, default=200,
+                        help="ontology names queried with two adjacent characters swapped")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ontology = load_ontology(args.ontology)
+    names = set(ontology.country_resolver.names) | set(ontology.person_resolver.names)
+    ontology_names = sorted(name for name in names if len(name) >= MIN_FUZZY_NAME_LENGTH)
+    words = sorted({word for name in names for word in name.split('_') if len(word) > 2})
+    while len(names) < args.entities:
+        names.add(generated_name(words, rng))
+    names = sorted(names)
+
+    start = time.perf_counter()
+    resolver = EntityResolver()
+    for name in names:
+        resolver.add(name, name)
+    print("indexed {} names in {:.1f} ms".format(len(names), 1e3 * (time.perf_counter() - start)))
+
+    queries = []
+    for _ in range(args.queries):
+        name = rng.choice(names)
+        queries.append((typo(name, rng), name))
+
+    latencies, found, exact, as_good = [], 0, 0, 0
+    for query, name in queries:
+        start = time.perf_counter()
+        value, confidence = resolver.resolve(query, MIN_MATCH_CONFIDENCE, MIN_FUZZY_NAME_LENGTH)
+        latencies.append(time.perf_counter() - start)
+        found += value is not None
+        exact += value == name
+    print("resolver: " + summary(latencies))
+    print("queries: {}, resolved: {}, to the misspelled name: {}".format(len(queries), found, exact))
+
+    # the index must find a name as close as the best of a full scan
+    scan_latencies = []
+    for query, name in queries[:args.scan_queries]:
+        start = time.perf_counter()
+        scan_name, scan_score = scan(names, query)
+        scan_latencies.append(time.perf_counter() - start)
+        value, confidence = resolver.resolve(query, MIN_MATCH_CONFIDENCE, MIN_FUZZY_NAME_LENGTH)
+        as_good += (scan_name is None and value is None) or \
+                   (scan_name is not None and abs(confidence - scan_score) < 1e-9)
+    print("scan: " + summary(scan_latencies))
+    print("resolver as close as the scan: {} / {}".format(as_good, min(args.scan_queries, len(queries))))
+
+    missed = 0
+    for name in rng.sample(ontology_names, min(args.transpositions, len(ontology_names))):
+        query = transposed(name, rng)
+        scan_name, scan_score = scan(names, query)
+        value, confidence = resolver.resolve(query, MIN_MATCH_CONFIDENCE, MIN_FUZZY_NAME_LENGTH)
+        if scan_name is not None and (value is None or abs(confidence - scan_score) > 1e-9):
+            missed += 1
+            print("missed transposition: {} (scan: {}, {:.2f})".format(query, scan_name, scan_score))
+    print("transposed names missed: {} / {}".format(missed, min(args.transpositions, len(ontology_names))))
+
+    answered = 0
+    for question in SHORT_NAME_QUESTIONS:
+        status, response = answer_question(ontology, question)
+        if status == ANSWERED:
+            answered += 1
+            print("answered short name: {} ({})".format(question, response))
+    print("short name questions answered: {} / {}".format(answered, len(SHORT_NAME_QUESTIONS)))
+    if missed or answered:
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
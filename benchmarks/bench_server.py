@@ -0,0 +1,109 @@
+"""
+load the question daemon (geo_qa.py serve) with many concurrent
+clients and report throughput and per-question latency, next to
+the latency of starting one geo_qa.py question process per
+question:
+    python benchmarks/bench_server.py --ontology ontology.nt --clients 50
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from bench_native import QUESTION_TEMPLATES
+
+GEO_QA = os.path.join(REPO_DIR, "geo_qa.py")
+COUNTRIES = ["France", "Germany", "Israel", "Japan", "Brazil", "Canada", "India", "Italy", "Spain", "Kenya"]
+
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    return "mean {:.2f} ms, p50 {:.2f} ms, p95 {:.2f} ms, max {:.2f} ms".format(
+        1e3 * sum(ordered) / len(ordered),
+        1e3 * ordered[len(ordered) // 2],
+        1e3 * ordered[int(len(ordered) * 0.95)],
+        1e3 * ordered[-1])
+
+
+def client(socket_path, questions, latencies, statuses):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        stream = sock.makefile('rwb')
+        for question in questions:
+            start = time.perf_counter()
+            stream.write(question.encode('utf-8') + b'\n')
+            stream.flush()
+            reply = json.loads(stream.readline().decode('utf-8'))
+            latencies.append(time.perf_counter() - start)
+            statuses[reply['status']] = statuses.get(reply['status'], 0) + 1
+
+
+def wait_for_socket(socket_path, timeout=60):
+    deadline = time.time() + timeout
+    while not os.path.exists(socket_path):
+        if time.time() > deadline:
+            raise RuntimeError("the daemon did not start")
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='question daemon load test')
+    parser.add_argument("--ontology", type=str, default="ontology.nt")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=200, help="questions per client")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--processes", type=int, default=10, help="questions asked with one process each")
+    args = parser.parse_args()
+
+    questions = [t.format(c) for c in COUNTRIES for t in QUESTION_TEMPLATES]
+    with tempfile.TemporaryDirectory() as work_dir:
+        shutil.copy(args.ontology, os.path.join(work_dir, "ontology.nt"))
+        if os.path.isfile(args.ontology + '.snap'):
+            shutil.copy(args.ontology + '.snap', os.path.join(work_dir, "ontology.nt.snap"))
+        socket_path = os.path.join(work_dir, "geo_qa.sock")
+
+        # one process per question, as without the daemon
+        process_latencies = []
+        for question in questions[:args.processes]:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, GEO_QA, "question", question, "--socket", socket_path],
+                           cwd=work_dir, stdout=subprocess.DEVNULL, check=True)
+            process_latencies.append(time.perf_counter() - start)
+        print("process per question: " + summary(process_latencies))
+
+        daemon = subprocess.Popen([sys.executable, GEO_QA, "serve", "--socket", socket_path,
+                                   "--workers", str(args.workers)],
+                                  cwd=work_dir, stdout=subprocess.DEVNULL)
+        try:
+            wait_for_socket(socket_path)
+            latencies, statuses = [], {}
+            threads = [threading.Thread(target=client, args=(
+                socket_path, [questions[(i + k) % len(questions)] for i in range(args.questions)],
+                latencies, statuses)) for k in range(args.clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+    print("daemon, {} clients: {} questions in {:.2f} s, {:.0f} questions/s".format(
+        args.clients, len(latencies), elapsed, len(latencies) / elapsed))
+    print("daemon latency: " + summary(latencies))
+    print("statuses: " + ", ".join("{}: {}".format(k, v) for k, v in sorted(statuses.items())))
+
+
+if __name__ == '__main__':
+    main()
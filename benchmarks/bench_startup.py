@@ -0,0 +1,126 @@
+"""
+measure the cold start of the question command, each run in a
+fresh interpreter:
+  - import: importing geo_qa
+  - cached: a question answered from the answer cache
+  - question: a question answered by loading the ontology
+and check which modules each one imports: no question may import
+the crawler (lxml, requests), and a cached answer needs no rdflib.
+exits non-zero on a forbidden import, or when a median time is
+over its budget: the --budget-ms default, or the saved baseline
+plus --tolerance when a baseline file exists.
+    python benchmarks/bench_startup.py --ontology ontology.nt
+    python benchmarks/bench_startup.py --ontology ontology.nt --update-baseline
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GEO_QA = os.path.join(REPO_DIR, "geo_qa.py")
+DEFAULT_BASELINE = os.path.join(REPO_DIR, "benchmarks", "startup_baseline.json")
+
+QUESTION = "What is the capital of France?"
+
+# scenario -> (geo_qa arguments, modules it must not import, budget in ms)
+SCENARIOS = {
+    'import': (None, ['lxml', 'requests', 'rdflib'], 150),
+    'cached': (["question", QUESTION, "--answer-cache", "answers.json"], ['lxml', 'requests', 'rdflib'], 250),
+    'question': (["question", QUESTION], ['lxml', 'requests'], 1500),
+}
+
+# runs geo_qa in this interpreter, then reports the modules it imported
+_PROBE = """
+import runpy, sys
+sys.argv = [{geo_qa!r}] + {argv!r}
+try:
+    if {argv!r}:
+        runpy.run_path({geo_qa!r}, run_name='__main__')
+    else:
+        sys.path.insert(0, {repo!r})
+        import geo_qa
+finally:
+    sys.stderr.write('MODULES ' + ' '.join(sorted({{m.split('.')[0] for m in sys.modules}})) + '\\n')
+"""
+
+
+def run_once(argv, work_dir):
+    if argv is None:
+        command = [sys.executable, "-c", "import sys; sys.path.insert(0, {!r}); import geo_qa".format(REPO_DIR)]
+    else:
+        command = [sys.executable, GEO_QA] + argv
+    start = time.perf_counter()
+    subprocess.run(command, cwd=work_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def imported_modules(argv, work_dir):
+    probe = _PROBE.format(geo_qa=GEO_QA, argv=argv or [], repo=REPO_DIR)
+    result = subprocess.run([sys.executable, "-c", probe], cwd=work_dir,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    for line in result.stderr.splitlines():
+        if line.startswith('MODULES '):
+            return set(line.split()[1:])
+    raise RuntimeError("probe failed:\n" + result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='cold start time of the question command')
+    parser.add_argument("--ontology", type=str, default="ontology.nt")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown over the baseline, as a fraction")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.isfile(args.baseline) and not args.update_baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    failures = []
+    medians = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        # the question commands read ontology.nt (and its snapshot) from the working directory
+        shutil.copy(args.ontology, os.path.join(work_dir, "ontology.nt"))
+        if os.path.isfile(args.ontology + '.snap'):
+            shutil.copy(args.ontology + '.snap', os.path.join(work_dir, "ontology.nt.snap"))
+        # fill the answer cache, and warm the os file cache
+        run_once(SCENARIOS['cached'][0], work_dir)
+
+        for name, (argv, forbidden, budget_ms) in SCENARIOS.items():
+            times = sorted(run_once(argv, work_dir) for _ in range(args.runs))
+            median_ms = 1e3 * times[len(times) // 2]
+            medians[name] = median_ms
+            if name in baseline:
+                budget_ms = baseline[name] * (1 + args.tolerance)
+            status = "ok" if median_ms <= budget_ms else "SLOW"
+            print("{:<9} median {:7.1f} ms  min {:7.1f} ms  budget {:7.1f} ms  {}".format(
+                name, median_ms, 1e3 * times[0], budget_ms, status))
+            if median_ms > budget_ms:
+                failures.append("{} took {:.1f} ms, budget {:.1f} ms".format(name, median_ms, budget_ms))
+
+            modules = imported_modules(argv, work_dir)
+            for module in forbidden:
+                if module in modules:
+                    failures.append("{} imports {}".format(name, module))
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as out:
+            json.dump({name: round(ms, 1) for name, ms in medians.items()}, out, indent=2)
+        print("baseline written to", args.baseline)
+
+    for failure in failures:
+        print("FAIL:", failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+compare rdflib's default in-memory store with the array store
+(array_store.ArrayStore over the memory mapped ontology index):
+resident memory of the loaded graph, latency of the count queries
+of execute_test_queries.py and of the SPARQL question templates,
+and that both stores give the same answers. --copies replicates
+the ontology with renamed entities, to compare larger graphs.
+Each store is measured in its own process (linux only, memory is
+read from /proc/self/status). On ontology.nt the array store holds
+the graph in about 0.1 MB against 4.7 MB, and its median latencies
+came to 0.7-1.45x the in-memory ones over repeated runs here
+(prime_minister_count, the slowest, was 1.8x before fully bound
+patterns became one lookup); the run fails if a median is more than
+--max-slowdown times the in-memory one:
+    python benchmarks/bench_store.py --ontology ontology.nt --copies 10
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+STORES = ["memory", "array"]
+COUNT_QUERIES = ['prime_minister_count', 'country_count', 'republic_count', 'monarchy_count']
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def replicate(nt_path, copies, out_path):
+    """
+    write copies of an ontology, every entity (uri that is the
+    subject of a triple) renamed with a _<copy> suffix in copy > 0.
+    """
+    from rdflib import Graph, URIRef
+    source = Graph()
+    source.parse(nt_path, format='nt')
+    entities = set(source.subjects())
+    out = Graph()
+    for copy in range(copies):
+        def rename(term):
+            if copy and term in entities:
+                return URIRef("{}_{}".format(term, copy))
+            return term
+        for s, p, o in source:
+            out.add((rename(s), p, rename(o)))
+    out.serialize(destination=out_path, format='nt', encoding='utf-8')
+    return len(out)
+
+
+def measure(store, nt_path, questions_limit, repeat):
+    # runs in the child process of one store
+    import execute_test_queries
+    from query_registry import prepare_all
+    from geo_query import load_ontology, load_mapped_ontology, answer_question
+    from bench_native import question_corpus
+    from bench_server import summary
+    prepare_all()
+    gc.collect()
+    result = {'store': store, 'rss_base_mb': rss_mb()}
+
+    start = time.perf_counter()
+    if store == "array":
+        from array_store import load_array_graph
+        graph = load_array_graph(nt_path)
+    else:
+        from snapshot import load_graph
+        graph = load_graph(nt_path)
+    result['load_s'] = time.perf_counter() - start
+    gc.collect()
+    result['graph_mb'] = rss_mb() - result['rss_base_mb']
+
+    result['counts'] = {}
+    for name in COUNT_QUERIES:
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = getattr(execute_test_queries, name + '_query')(graph)
+            latencies.append(time.perf_counter() - start)
+        result['counts'][name] = {'value': str(rows[0][0]), 'latency': summary(latencies),
+                                  'p50_s': sorted(latencies)[len(latencies) // 2]}
+    gc.collect()
+    result['after_queries_mb'] = rss_mb() - result['rss_base_mb']
+    del graph
+
+    ontology = load_mapped_ontology(nt_path) if store == "array" else load_ontology(nt_path)
+    questions = question_corpus(ontology)
+    step = max(1, len(questions) // questions_limit)
+    questions = questions[::step][:questions_limit]
+    latencies, answers = [], []
+    for question in questions:
+        start = time.perf_counter()
+        status, response = answer_question(ontology, question, native=False)
+        latencies.append(time.perf_counter() - start)
+        # multi row answers have no defined row order
+        answers.append([question, status, sorted(response.split(", "))])
+    result['questions'] = len(questions)
+    result['question_latency'] = summary(latencies)
+    result['question_total_s'] = sum(latencies)
+    result['question_p50_s'] = sorted(latencies)[len(latencies) // 2]
+    result['answers'] = answers
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='in-memory vs array triple store')
+    parser.add_argument("--ontology", type=str, default="ontology.nt")
+    parser.add_argument("--copies", type=int, default=1, help="copies of the ontology to load")
+    parser.add_argument("--questions", type=int, default=500, help="SPARQL template questions timed")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each count query")
+    parser.add_argument("--max-slowdown", type=float, default=1.75,
+                        help="highest array / in-memory ratio of a median latency that passes")
+    parser.add_argument("--child", type=str, choices=STORES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.ontology, args.questions, args.repeat)))
+        return
+
+    from ontology_index import write_index
+    with tempfile.TemporaryDirectory() as work_dir:
+        nt_path = os.path.join(work_dir, "ontology.nt")
+        triples = replicate(args.ontology, args.copies, nt_path)
+        # written here, so neither child pays for it
+        write_index(nt_path)
+        print("{} triples ({} copies of {})".format(triples, args.copies, args.ontology))
+
+        results = {}
+        for store in STORES:
+            child = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", store,
+                                    "--ontology", nt_path, "--questions", str(args.questions),
+                                    "--repeat", str(args.repeat)],
+                                   stdout=subprocess.PIPE, check=True, universal_newlines=True)
+            results[store] = json.loads(child.stdout.strip().splitlines()[-1])
+
+    for store in STORES:
+        result = results[store]
+        print("{} store: load {:.2f} s, graph {:.1f} MB, {:.1f} MB after the count queries".format(
+            store, result['load_s'], result['graph_mb'], result['after_queries_mb']))
+        for name in COUNT_QUERIES:
+            count = result['counts'][name]
+            print("  {}: {}, {}".format(name, count['value'], count['latency']))
+        print("  {} SPARQL template questions: {}".format(result['questions'], result['question_latency']))
+
+    memory, array = results['memory'], results['array']
+    mismatches = [name for name in COUNT_QUERIES if memory['counts'][name]['value'] != array['counts'][name]['value']]
+    mismatches += [a[0] for a, b in zip(memory['answers'], array['answers']) if a != b]
+    for mismatch in mismatches:
+        print("mismatch: " + mismatch)
+    print("mismatches: {}".format(len(mismatches)))
+    print("graph memory: {:.1f}x smaller, questions: {:.2f}x the in-memory latency".format(
+        memory['graph_mb'] / max(array['graph_mb'], 0.1),
+        array['question_total_s'] / memory['question_total_s']))
+
+    # medians, so one slow run (a page fault, a gc pass) does not fail it
+    ratios = {name: array['counts'][name]['p50_s'] / memory['counts'][name]['p50_s'] for name in COUNT_QUERIES}
+    ratios['questions'] = array['question_p50_s'] / memory['question_p50_s']
+    over = ["{} {:.2f}x".format(name, ratio) for name, ratio in ratios.items() if ratio > args.max_slowdown]
+    if over:
+        print("slower than {:.2f}x the in-memory store: {}".format(args.max_slowdown, ", ".join(over)))
+    if mismatches or over:
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""
+time every stage of the pipeline on saved fixtures, no network
+needed, and write the results as json so runs of different
+commits can be compared. By default it runs on fixtures that
+benchmarks/fixtures/make_fixtures.py writes to a temporary directory:
+  - extract: get_country_info over the country pages in the page cache
+  - build: build_ontology_from_info over the records of a crawl log
+    (or, without one, over the infos extract produced)
+  - load: Graph.parse of the ontology N-Triples
+  - parse_query: parse_query over a question corpus
+  - template <key>: each query_formats template end to end, question
+    string to answer, through the SPARQL path
+with --compare, medians are checked against an earlier results file
+and the run exits non-zero when one is slower than --tolerance allows.
+    python benchmarks/bench_suite.py --out bench_results.json
+    python benchmarks/bench_suite.py --cache-dir .wiki_cache --crawl-log country_info.jsonl
+    python benchmarks/bench_suite.py --compare bench_results.json --out bench_new.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BENCHMARKS = ['extract', 'build', 'load', 'parse_query', 'templates']
+FIXTURES_DIR = os.path.join(REPO_DIR, "benchmarks", "fixtures")
+sys.path.insert(0, FIXTURES_DIR)
+
+
+def stats(samples):
+    """
+    :param samples: list of durations in seconds
+    :return: dict of summary statistics, in milliseconds
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {'runs': 0}
+    return {'runs': len(ordered),
+            'min_ms': 1e3 * ordered[0],
+            'mean_ms': 1e3 * sum(ordered) / len(ordered),
+            'p50_ms': 1e3 * ordered[len(ordered) // 2],
+            'p95_ms': 1e3 * ordered[int(len(ordered) * 0.95)],
+            'max_ms': 1e3 * ordered[-1],
+            'total_ms': 1e3 * sum(ordered)}
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def bench_extract(cache_dir, repeat):
+    """
+    :raise FetchError: if the cache has no country list page
+    """
+    from wiki_fetch import configure_cache, PageCache, FetchError
+    from geo_build import get_country_links, get_country_info, COUNTRY_WIKI_URL, WIKIPEDIA_BASE_URL
+    # the same country pages create crawls, served from the cache only
+    configure_cache(cache_dir, offline=True)
+    cache = PageCache(cache_dir, offline=True)
+    pages, missing = [], 0
+    for country, link in sorted(get_country_links(COUNTRY_WIKI_URL).items()):
+        _, body = cache.lookup(WIKIPEDIA_BASE_URL + link)
+        if body is None:
+            missing += 1
+        else:
+            pages.append((country, WIKIPEDIA_BASE_URL + link, body))
+
+    samples, infos, skipped = [], {}, 0
+    for _ in range(repeat):
+        for country, url, body in pages:
+            start = time.perf_counter()
+            try:
+                infos[country] = get_country_info(url, page_content=body)
+            except FetchError:  # a page without an infobox, as create skips it
+                skipped += 1
+                continue
+            samples.append(time.perf_counter() - start)
+    result = dict(stats(samples), pages=len(pages), missing=missing, skipped=skipped // repeat)
+    return result, infos
+
+
+def bench_build(crawl_log, extracted, repeat):
+    from geo_build import build_ontology_from_info
+    if crawl_log and os.path.isfile(crawl_log):
+        from crawler import iter_country_records
+        # read up front, so only the build itself is timed
+        records, source = list(iter_country_records(crawl_log)), crawl_log
+    else:
+        records, source = sorted(extracted.items()), 'extract'
+    samples, triples = [], 0
+    with tempfile.TemporaryDirectory() as work_dir:
+        out_path = os.path.join(work_dir, "ontology.nt")
+        for _ in range(repeat):
+            elapsed, triples = timed(build_ontology_from_info, records, out_path)
+            samples.append(elapsed)
+    return dict(stats(samples), countries=len(records), triples=triples, source=source)
+
+
+def bench_load(ontology_path, repeat):
+    from rdflib import Graph
+    samples, triples = [], 0
+    for _ in range(repeat):
+        graph = Graph()
+        elapsed, _ = timed(graph.parse, ontology_path, None, 'nt')
+        samples.append(elapsed)
+        triples = len(graph)
+    return dict(stats(samples), triples=triples)
+
+
+def bench_parse_query(questions, repeat):
+    from question_classifier import parse_query
+    samples, unrecognized = [], 0
+    for _ in range(repeat):
+        for question in questions:
+            elapsed, (query_key, _) = timed(parse_query, question)
+            samples.append(elapsed)
+            unrecognized += query_key is None
+    return dict(stats(samples), questions=len(questions), unrecognized=unrecognized // repeat)
+
+
+def bench_templates(ontology, questions, repeat):
+    from question_classifier import parse_query
+    from geo_query import query_formats, answer_question, ANSWERED
+    by_key = {key: [] for key in query_formats}
+    for question in questions:
+        query_key, _ = parse_query(question)
+        if query_key in by_key:
+            by_key[query_key].append(question)
+
+    results = {}
+    for key, key_questions in by_key.items():
+        samples, answered = [], 0
+        for _ in range(repeat):
+            for question in key_questions:
+                elapsed, (status, _) = timed(answer_question, ontology, question, False)
+                samples.append(elapsed)
+                answered += status == ANSWERED
+        results[key] = dict(stats(samples), questions=len(key_questions),
+                            answered=answered // repeat if repeat else 0)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results):
+    # benchmark name -> median, with one entry per template
+    medians = {}
+    for name, result in results.items():
+        if name == 'templates':
+            for key, template in result.items():
+                if template.get('runs'):
+                    medians['template ' + key] = template['p50_ms']
+        elif result.get('runs'):
+            medians[name] = result['p50_ms']
+    return medians
+
+
+def compare(results, previous_path, tolerance):
+    """
+    print the change of every median against an earlier run
+    :return: names of the benchmarks slower than tolerance allows
+    """
+    with open(previous_path, 'r') as f:
+        previous = flatten(json.load(f)['results'])
+    regressions = []
+    for name, median in flatten(results).items():
+        if name not in previous:
+            continue
+        ratio = median / previous[name] if previous[name] else 1.0
+        slower = ratio > 1 + tolerance
+        print("  {:<22} {:9.3f} ms -> {:9.3f} ms  {:.2f}x{}".format(
+            name, previous[name], median, ratio, "  REGRESSION" if slower else ""))
+        if slower:
+            regressions.append(name)
+    return regressions
+
+
+def run(args):
+    """
+    :param args: parsed arguments of main
+    :return: dict of the results of the selected benchmarks
+    """
+    results, extracted = {}, {}
+    if 'extract' in args.only:
+        from wiki_fetch import FetchError
+        if not os.path.isdir(args.cache_dir):
+            print("Error: no page cache at {}.".format(args.cache_dir))
+            exit(1)
+        try:
+            results['extract'], extracted = bench_extract(args.cache_dir, args.repeat)
+        except FetchError as e:
+            print("Error: the page cache at {} has no country list page ({}).".format(args.cache_dir, e))
+            exit(1)
+    if 'build' in args.only:
+        if not os.path.isfile(args.crawl_log) and not extracted:
+            print("Error: no crawl log at {}, and no pages extracted to build from.".format(args.crawl_log))
+            exit(1)
+        results['build'] = bench_build(args.crawl_log, extracted, args.repeat)
+
+    if set(args.only) & {'load', 'parse_query', 'templates'}:
+        if not os.path.isfile(args.ontology):
+            print("Error: ontology file {} was not found.".format(args.ontology))
+            exit(1)
+        from geo_query import load_ontology
+        from bench_native import question_corpus
+        ontology = load_ontology(args.ontology)
+        if args.questions:
+            with open(args.questions, 'r', encoding='utf-8') as f:
+                questions = [line.strip() for line in f if line.strip()]
+        else:
+            questions = question_corpus(ontology)
+        if 'load' in args.only:
+            results['load'] = bench_load(args.ontology, args.repeat)
+        if 'parse_query' in args.only:
+            results['parse_query'] = bench_parse_query(questions, args.repeat)
+        if 'templates' in args.only:
+            results['templates'] = bench_templates(ontology, questions, args.repeat)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='offline benchmark suite')
+    parser.add_argument("--cache-dir", type=str, default="",
+                        help="page cache with the crawled pages (default: generated fixtures)")
+    parser.add_argument("--crawl-log", type=str, default="",
+                        help="crawl log the build is timed over (default: generated with the fixtures)")
+    parser.add_argument("--ontology", type=str, default=os.path.join(REPO_DIR, "ontology.nt"))
+    parser.add_argument("--questions", type=str, default="",
+                        help="question corpus, one per line (default: generated from the ontology)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every benchmark")
+    parser.add_argument("--only", type=str, nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--out", type=str, default="bench_results.json")
+    parser.add_argument("--compare", type=str, default="", help="earlier results file to check against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown of a median over --compare, as a fraction")
+    args = parser.parse_args()
+
+    # as given, before the generated fixtures fill them in
+    fixtures = {'cache_dir': args.cache_dir or 'generated', 'crawl_log': args.crawl_log or None,
+                'ontology': args.ontology, 'questions': args.questions or None}
+    with tempfile.TemporaryDirectory() as fixtures_dir:
+        if not args.cache_dir:
+            import make_fixtures
+            args.cache_dir = os.path.join(fixtures_dir, "wiki_cache")
+            crawl_log = os.path.join(fixtures_dir, "country_info.jsonl")
+            make_fixtures.build(args.cache_dir, crawl_log)
+            if not args.crawl_log:
+                args.crawl_log, fixtures['crawl_log'] = crawl_log, 'generated'
+        results = run(args)
+
+    for name, result in results.items():
+        if name == 'templates':
+            for key, template in result.items():
+                print("template {:<12} {:5d} questions, p50 {:.3f} ms".format(
+                    key, template['questions'], template.get('p50_ms', 0.0)))
+        elif result.get('runs'):
+            print("{:<21} {:5d} runs, p50 {:.3f} ms, total {:.1f} ms".format(
+                name, result['runs'], result['p50_ms'], result['total_ms']))
+
+    import rdflib
+    report = {'commit': git_commit(),
+              'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'python': platform.python_version(),
+              'rdflib': rdflib.__version__,
+              'repeat': args.repeat,
+              'fixtures': fixtures,
+              'results': results}
+    with open(args.out, 'w') as out:
+        json.dump(report, out, indent=2)
+    print("results written to", args.out)
+
+    if args.compare:
+        print("against {}:".format(args.compare))
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print("slower than {:.0%} over {}: {}".format(args.tolerance, args.compare, ", ".join(regressions)))
+            exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+write the fixtures the benchmarks run on without network: a page
+cache (wiki_fetch.PageCache layout) holding the country list page,
+the state leaders page, a few country pages and their leaders'
+pages, and the crawl log build_ontology.py records from them.
+The pages are trimmed copies of the wikipedia markup the extractors
+read (infobox rows, country list table, leader lists), followed by
+article text so that parsing a page costs about what a real one does.
+The output is the same on every run, so it is not committed: the
+benchmarks call build into a temporary directory (under a second),
+and this script writes it next to itself to keep one around:
+    python benchmarks/fixtures/make_fixtures.py
+    python benchmarks/bench_suite.py --cache-dir benchmarks/fixtures/wiki_cache \
+        --crawl-log benchmarks/fixtures/country_info.jsonl
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from urllib.parse import quote
+
+FIXTURES_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(os.path.dirname(FIXTURES_DIR))
+sys.path.insert(0, REPO_DIR)
+
+from wiki_fetch import PageCache, configure_cache
+
+CACHE_DIR = os.path.join(FIXTURES_DIR, "wiki_cache")
+CRAWL_LOG = os.path.join(FIXTURES_DIR, "country_info.jsonl")
+BASE_URL = "https://en.wikipedia.org"
+COUNTRY_LIST_URL = BASE_URL + "/wiki/List_of_countries_and_dependencies_by_population"
+LEADER_URL = BASE_URL + "/wiki/List_of_state_leaders_in_2019"
+
+# paragraphs of article text after the infobox: a country page comes
+# to about 330 KB, as the html of a real one, a person page to 110 KB
+COUNTRY_PARAGRAPHS = 1200
+PERSON_PARAGRAPHS = 400
+
+# page, list name, territory, capital, area, population, government
+# types (a None splits the de jure types from the rest of the row),
+# president, prime minister, other leader row
+COUNTRIES = [
+    ("France", "France", False, ("Paris", "Paris"), "640,679", "67,022,000",
+     [("Unitary_state", "Unitary state", "Unitary"),
+      ("Semi-presidential_system", "Semi-presidential system", "semi-presidential"),
+      ("Republic", "Republic", "republic")],
+     ("Emmanuel_Macron", "Emmanuel Macron"), ("Édouard_Philippe", "Édouard Philippe"), None),
+    ("Germany", "Germany", False, ("Berlin", "Berlin"), "357,386", "83,149,300",
+     [("Federation", "Federation", "Federal"),
+      ("Parliamentary_republic", "Parliamentary republic", "parliamentary republic")],
+     ("Frank-Walter_Steinmeier", "Frank-Walter Steinmeier"), None, ("Chancellor", "Angela_Merkel", "Angela Merkel")),
+    ("Israel", "Israel", False, ("Jerusalem", "Jerusalem"), "20,770", "9,136,000",
+     [("Unitary_state", "Unitary state", "Unitary"),
+      ("Parliamentary_system", "Parliamentary system", "parliamentary"),
+      ("Republic", "Republic", "republic")],
+     ("Reuven_Rivlin", "Reuven Rivlin"), ("Benjamin_Netanyahu", "Benjamin Netanyahu"), None),
+    ("Japan", "Japan", False, ("Tokyo", "Tokyo"), "377,975", "126,150,000",
+     [("Unitary_state", "Unitary state", "Unitary"),
+      ("Parliamentary_system", "Parliamentary system", "parliamentary"),
+      ("Constitutional_monarchy", "Constitutional monarchy", "constitutional monarchy")],
+     None, ("Shinzo_Abe", "Shinzō Abe"), ("Emperor", "Naruhito", "Naruhito")),
+    ("Saudi_Arabia", "Saudi Arabia", False, ("Riyadh", "Riyadh"), "2,149,690", "34,218,169",
+     [("Unitary_state", "Unitary state", "Unitary"),
+      ("Islamic_state", "Islamic state", "Islamic"),
+      ("Absolute_monarchy", "Absolute monarchy", "absolute monarchy")],
+     None, None, ("King", "Salman_of_Saudi_Arabia", "Salman")),
+    ("Ivory_Coast", "Ivory Coast", False, ("Yamoussoukro", "Yamoussoukro"), "322,463", "25,823,071",
+     [("Unitary_state", "Unitary state", "Unitary"),
+      ("Presidential_system", "Presidential system", "presidential"),
+      ("Republic", "Republic", "republic")],
+     ("Alassane_Ouattara", "Alassane Ouattara"), ("Amadou_Gon_Coulibaly", "Amadou Gon Coulibaly"), None),
+    ("Puerto_Rico", "Puerto Rico", True, ("San_Juan,_Puerto_Rico", "San Juan, Puerto Rico"), "9,104", "3,193,694",
+     [("Unincorporated_territories_of_the_United_States", "Unincorporated territories of the United States",
+       "Unincorporated territory"),
+      None,
+      ("Presidential_system", "Presidential system", "presidential")],
+     None, None, ("Governor", "Wanda_Vázquez_Garced", "Wanda Vázquez Garced")),
+]
+
+# countries whose President label is not the first text of its header
+# ("• <a>Head of state</a><br/>President"), found only by matching
+# every text node of the header, as the old text()='President' did
+SECOND_TEXT_PRESIDENT_LABEL = {"Israel"}
+
+BIRTHDAYS = {"Emmanuel_Macron": "1977-12-21",
+             "Édouard_Philippe": "1970-11-28",
+             "Frank-Walter_Steinmeier": "1956-01-05",
+             "Reuven_Rivlin": "1939-09-09",
+             "Benjamin_Netanyahu": "1949-10-21",
+             "Shinzo_Abe": "1954-09-21",
+             "Alassane_Ouattara": "1942-01-01",
+             "Amadou_Gon_Coulibaly": "1959-02-10"}
+
+
+def href(page):
+    # wikipedia percent-encodes the non ascii characters of page names
+    return "/wiki/" + quote(page, safe=",()'-_")
+
+
+def link(page, title, text=None):
+    return '<a href="{}" title="{}">{}</a>'.format(href(page), title, text or title)
+
+
+def article(title, paragraphs):
+    paragraph = ('<p>The history of {0} is covered in {1} and {2}, and its '
+                 '<a href="/wiki/Economy">economy</a> in the sections below.<sup class="reference">'
+                 '<a href="#cite_note-1">[1]</a></sup></p>').format(
+        title, link("History", "History"), link("Geography", "Geography"))
+    navbox = ('<table class="navbox"><tr><th>{}</th><td>{} · {}</td></tr></table>'.format(
+        link("Politics", "Politics"), link("Government", "Government"), link("Elections", "Elections")))
+    return '<div class="mw-parser-output">' + paragraph * paragraphs + navbox + '</div>'
+
+
+def leader_row(label_page, label, person, second_text=False):
+    if person is None:
+        return ''
+    if second_text:
+        header = '• {}<br/>{}'.format(link("Head_of_state", "Head of state"), label)
+    else:
+        header = '• ' + link(label_page, label)
+    return ('<tr class="mergedrow"><th scope="row"><div style="text-indent:-0.9em;margin-left:1.2em">'
+            '{}</div></th><td>{}</td></tr>').format(header, link(person[0], person[1]))
+
+
+def country_page(page, name, capital, area, population, government, president, prime, other):
+    government_cells = []
+    for item in government:
+        if item is None:
+            government_cells.append('(' + link("De_jure", "De jure", "de jure") + ')')
+        else:
+            government_cells.append(link(*item))
+    rows = [
+        '<tr><th colspan="2" class="adr"><div class="fn org country-name">{}</div></th></tr>'.format(name),
+        ('<tr class="mergedtoprow"><th scope="row">Capital<div>and largest city</div></th><td>{}<br/>'
+         '<span class="plainlinks"><a class="external text" href="https://geohack.toolforge.org/{}">'
+         'coordinates</a></span><sup class="reference"><a href="#cite_note-endnote_1">[a]</a></sup>'
+         '</td></tr>').format(link(capital[0], capital[1]), capital[0]),
+        ('<tr class="mergedtoprow"><th scope="row">{}</th><td>{}</td></tr>').format(
+            link("Politics_of_" + page, "Politics of " + name, "Government"), ' '.join(government_cells)),
+        leader_row("President_of_" + page, "President", president, page in SECOND_TEXT_PRESIDENT_LABEL),
+        leader_row("Prime_Minister_of_" + page, "Prime Minister", prime),
+        leader_row(other[0] + "_of_" + page, other[0], other[1:]) if other else '',
+        '<tr class="mergedtoprow"><th colspan="2">{}</th></tr>'.format(link("Geography_of_" + page, "Geography", "Area")),
+        ('<tr class="mergedrow"><th scope="row">• Total</th><td>{} km<sup>2</sup> ({} sq mi)'
+         '<sup class="reference"><a href="#cite_note-2">[2]</a></sup></td></tr>').format(area, area),
+        '<tr class="mergedtoprow"><th colspan="2">{}</th></tr>'.format(
+            link("Demographics_of_" + page, "Demographics of " + name, "Population")),
+        ('<tr class="mergedrow"><th scope="row">• 2019 estimate</th><td>{}<sup class="reference">'
+         '<a href="#cite_note-3">[3]</a></sup></td></tr>').format(population),
+    ]
+    return ('<!DOCTYPE html><html><head><meta charset="UTF-8"/><title>{0} - Wikipedia</title></head><body><div id="content">'
+            '<h1 id="firstHeading">{0}</h1><div id="bodyContent">'
+            '<table class="infobox geography vcard"><tbody>{1}</tbody></table>{2}'
+            '</div></div></body></html>').format(name, ''.join(rows), article(name, COUNTRY_PARAGRAPHS)).encode('utf-8')
+
+
+def person_page(title, birthday):
+    infobox = ('<table class="infobox vcard"><tbody><tr><th>Personal details</th></tr><tr><th>Born</th>'
+               '<td><span style="display:none">(<span class="bday">{}</span>)</span></td></tr>'
+               '</tbody></table>').format(birthday)
+    return ('<!DOCTYPE html><html><head><meta charset="UTF-8"/><title>{0} - Wikipedia</title></head><body><div id="content">'
+            '{1}{2}</div></body></html>').format(title, infobox, article(title, PERSON_PARAGRAPHS)).encode('utf-8')
+
+
+def country_list_page():
+    rows = ['<tr><th>Rank</th><th>Country or dependent territory</th><th>Population</th></tr>']
+    for rank, (page, name, territory, _, _, population, _, _, _, _) in enumerate(COUNTRIES, 1):
+        flag = '<span class="flagicon"><img alt="" src="//upload.wikimedia.org/flag.png"/>&#160;</span>'
+        entry = '<i>{}</i> (United States)'.format(link(page, name)) if territory else link(page, name)
+        rows.append('<tr><td>{}</td><td style="text-align:left">{}{}</td><td>{}</td></tr>'.format(
+            rank, flag, entry, population))
+    return ('<!DOCTYPE html><html><head><meta charset="UTF-8"/></head><body><table class="wikitable sortable"><tbody>{}</tbody></table>'
+            '</body></html>').format(''.join(rows)).encode('utf-8')
+
+
+def leaders_page():
+    items = []
+    for page, name, _, _, _, _, _, president, prime, other in COUNTRIES:
+        roles = []
+        if president:
+            roles.append('<li>President – {}</li>'.format(link(*president)))
+        if prime:
+            roles.append('<li>Prime Minister – {}</li>'.format(link(*prime)))
+        if other:
+            roles.append('<li>{} – {}</li>'.format(other[0], link(*other[1:])))
+        items.append('<li><b>{}</b><ul>{}</ul></li>'.format(link(page, name), ''.join(roles)))
+    return ('<!DOCTYPE html><html><head><meta charset="UTF-8"/></head><body><ul>{}</ul></body></html>'.format(''.join(items))).encode('utf-8')
+
+
+def build(cache_dir, crawl_log):
+    """
+    write the fixture page cache and the crawl log recorded from it.
+    :param cache_dir: directory of the page cache, replaced if it exists
+    :param crawl_log: path of the crawl log, replaced if it exists
+    """
+    cache_dir, crawl_log = os.path.abspath(cache_dir), os.path.abspath(crawl_log)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    cache = PageCache(cache_dir)
+    cache.store(COUNTRY_LIST_URL, country_list_page())
+    cache.store(LEADER_URL, leaders_page())
+    for page, name, _, capital, area, population, government, president, prime, other in COUNTRIES:
+        cache.store(BASE_URL + href(page),
+                    country_page(page, name, capital, area, population, government, president, prime, other))
+    for person, birthday in BIRTHDAYS.items():
+        cache.store(BASE_URL + href(person), person_page(person.replace("_", " "), birthday))
+
+    # the crawl log, recorded by build_ontology.py from the cache
+    import build_ontology
+    configure_cache(cache_dir, offline=True)
+    if os.path.exists(crawl_log):
+        os.remove(crawl_log)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)  # build_ontology writes its ontology.nt to the working directory
+        try:
+            build_ontology.main(workers=1, log_path=crawl_log)
+        finally:
+            os.chdir(cwd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='write the benchmark fixtures')
+    parser.add_argument("--cache-dir", type=str, default=CACHE_DIR)
+    parser.add_argument("--crawl-log", type=str, default=CRAWL_LOG)
+    args = parser.parse_args()
+    build(args.cache_dir, args.crawl_log)
+    print("fixtures written to", args.cache_dir, "and", args.crawl_log)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,29 @@
 from lxml import html
 import lxml
-import pickle
-import requests
-from rdflib import URIRef, Literal, XSD
-import rdflib
 import re
+import argparse
 import unicodedata
+from crawler import crawl_countries, fetch_leader_birthdays, leader_links_of, DEFAULT_WORKERS
+from crawler import CrawlLog, read_crawl_progress, iter_country_records
+from infobox import parse_first_element, is_infobox, is_bday
+from infobox import index_infobox_rows, ROW_FIRST_TD_LINK, ROW_NESTED_TD_LINK, ROW_CAPITAL_LINK
+from infobox import ROW_FIRST_TD_TEXT, ROW_TD_TEXTS, ROW_TD_NODES
+from ntriples import NTriplesWriter, country_triples
+from wiki_fetch import fetch, configure_cache, FetchError
 
 
 COUNTRY_WIKI_URL = "https://en.wikipedia.org/wiki/List_of_countries_and_dependencies_by_population"
 WIKIPEDIA_BASE_URL = "https://en.wikipedia.org"
+CRAWL_LOG_PATH = "country_info.jsonl"
+LEADER_URL = "https://en.wikipedia.org/wiki/List_of_state_leaders_in_2019"
+
+# leader roles listed per country on the state leaders page
+LEADER_ROLES = {'president': 'President',
+                'prime_minister': 'Prime Minister',
+                'monarch': 'Monarch',
+                'chancellor': 'Chancellor',
+                'premier': 'Premier',
+                'governor': 'Governor'}
 
 def strip_accents(s):
    return ''.join(c for c in unicodedata.normalize('NFD', s)
@@ -41,20 +55,27 @@ def clean_number(num_string):
         return None
 
 
-def get_countries_with_presidents():
-    LEADER_URL = "https://en.wikipedia.org/wiki/List_of_state_leaders_in_2019"
-    res = requests.get(LEADER_URL)
-    page = html.fromstring(res.content)
-    presidents = set(page.xpath("//li[descendant::li[contains(text(), 'President')]]/b/a[@href]/@href"))
-    return set([WIKIPEDIA_BASE_URL + p for p in presidents])
-
-
-def get_countries_with_primes():
-    LEADER_URL = "https://en.wikipedia.org/wiki/List_of_state_leaders_in_2019"
-    res = requests.get(LEADER_URL)
-    page = html.fromstring(res.content)
-    primes = page.xpath("//li[descendant::li[contains(text(), 'Prime Minister')]]/b/a[@href]/@href")
-    return set([WIKIPEDIA_BASE_URL + p for p in primes])
+def get_state_leaders():
+    """
+    download the state leaders page once and, in a single
+    traversal of its country entries, find which countries
+    have each of the LEADER_ROLES.
+    :return: dict role -> set of full country wiki links,
+    for O(1) membership checks per country
+    """
+    page = html.fromstring(fetch(LEADER_URL))
+    leaders = {role: set() for role in LEADER_ROLES}
+    for country_li in page.iter('li'):
+        country_a = country_li.find('b/a[@href]')
+        if country_a is None:
+            continue
+        country_link = WIKIPEDIA_BASE_URL + country_a.attrib['href']
+        for role_li in country_li.iterdescendants('li'):
+            role_text = role_li.text or ''
+            for role, label in LEADER_ROLES.items():
+                if label in role_text:
+                    leaders[role].add(country_link)
+    return leaders
 
 
 def get_country_links(countries_wiki_url):
@@ -67,8 +88,7 @@ def get_country_links(countries_wiki_url):
     :return: name (str) -> link dict (str)
     """
     # get page and parse it
-    country_res = requests.get(countries_wiki_url)
-    country_page = html.fromstring(country_res.content)
+    country_page = html.fromstring(fetch(countries_wiki_url))
 
     # get links for countries that are not territories of another country
     non_teritories = country_page.xpath("//table[1]//td[descendant::span[@class='flagicon'] or descendant::a[@title and @href]]/a[@title and @href]")
@@ -93,21 +113,26 @@ def get_pres_prime_bday(president_link):
     :param president_link: link to president wikipedia page
     :return: string repersenting birth date
     """
-    res = requests.get(president_link)
-    page = html.fromstring(res.content)
-    bday = page.xpath("//span[@class='bday']/text()")
-    return bday[0] if bday else None
+    try:
+        content = fetch(president_link)
+    except FetchError as e:
+        print(e)
+        return None
+    # the bday span sits in the infobox, no need to parse the rest of the article
+    bday = parse_first_element(content, is_bday)
+    return bday.text if bday is not None else None
 
 
-def get_country_population(infobox):
+def get_country_population(rows):
     """
     extract the estimated population of a country
     from it's infobox. If more than one estimate
     exists, the first is taken (usually latest)
-    :param infobox: lxml html element of infobox
+    :param rows: infobox row index, see index_infobox_rows
     :return: population (int) or None of missing.
     """
-    population_estimate = infobox.xpath("descendant::tr[descendant::*[contains(text(), 'Population')]]/following::tr[1]/td//text()[1]")
+    value_row = rows.get('population_value')
+    population_estimate = ROW_TD_TEXTS(value_row) if value_row is not None else []
     if len(population_estimate) > 0:
         pop_num = clean_number(population_estimate[0])
         assert pop_num
@@ -116,51 +141,54 @@ def get_country_population(infobox):
         return None
 
 
-def get_country_prime(infobox):
+def get_country_prime(rows):
     """
-    extract prime minister name, wiki link and
-    birthday from infobox.
-    :param infobox: lxml html element of infobox
-    :return: tuple of name, link and bday, or None
-    if missing from infobox.
+    extract prime minister name and wiki link from
+    infobox. The birthday is resolved later, once per
+    unique leader page, by fetch_leader_birthdays.
+    :param rows: infobox row index, see index_infobox_rows
+    :return: tuple of name and link, or None if missing
+    from infobox.
     """
     # get prime minister and link if exist
-    priminister_a = infobox.xpath("descendant::tr[descendant::*[contains(text(), 'Prime Minister')]][1]/td[1]//a[1]")
+    prime_row = rows.get('prime_minister')
+    priminister_a = ROW_FIRST_TD_LINK(prime_row) if prime_row is not None else []
     if len(priminister_a) > 0:
         name = normalize_text(priminister_a[0].attrib['title'])
         link = priminister_a[0].attrib['href']
-        bday = get_pres_prime_bday(WIKIPEDIA_BASE_URL + link)
-        return name, link, bday
+        return name, link
     else:
-        return None, None, None
+        return None, None
 
 
-def get_country_president(infobox):
+def get_country_president(rows):
     """
-    extract president name, wiki link and
-    birthday from infobox.
-    :param infobox: lxml html element of infobox
-    :return: tuple of name, link and bday or None
-    if missing from infobox.
+    extract president name and wiki link from
+    infobox. The birthday is resolved later, once per
+    unique leader page, by fetch_leader_birthdays.
+    :param rows: infobox row index, see index_infobox_rows
+    :return: tuple of name and link or None if
+    missing from infobox.
     """
-    president_a = infobox.xpath("descendant::tr[descendant::*[text()='President']][1]//td[1]//a[1]")
+    president_row = rows.get('president')
+    president_a = ROW_NESTED_TD_LINK(president_row) if president_row is not None else []
     if len(president_a) > 0:
         name = normalize_text(president_a[0].attrib['title'])
         link = president_a[0].attrib['href']
-        bday = get_pres_prime_bday(WIKIPEDIA_BASE_URL + link)
-        return name, link, bday
+        return name, link
     else:
-        return None, None, None
+        return None, None
 
 
-def get_country_capital(infobox):
+def get_country_capital(rows):
     """
     extract capital city and link to it's wiki
     page from infobox.
-    :param infobox: lxml.html element of infobox
+    :param rows: infobox row index, see index_infobox_rows
     :return: tuple of name and link
     """
-    capital_a = infobox.xpath("descendant::tr[th[contains(text(), 'Capital')]][1]//a[not(contains(@class, 'external')) and not(contains(@href, 'endnote'))][1]")
+    capital_row = rows.get('capital')
+    capital_a = ROW_CAPITAL_LINK(capital_row) if capital_row is not None else []
     if len(capital_a) > 0:
         name = normalize_text(capital_a[0].attrib['title'])
         link = capital_a[0].attrib['href']
@@ -169,30 +197,31 @@ def get_country_capital(infobox):
         return None, None
 
 
-def get_country_area(infobox):
+def get_country_area(rows):
     """
     extract total area of country in square km
     from infobox.
-    :param infobox: lxml.html element of infobox
+    :param rows: infobox row index, see index_infobox_rows
     :return: area (int) or None if missing.
     """
-    country_area = infobox.xpath("descendant::tr[contains(th//text(), 'Total')][1]/td[1]/text()[1]")
+    total_row = rows.get('total')
+    country_area = ROW_FIRST_TD_TEXT(total_row) if total_row is not None else []
     if len(country_area) > 0:
         return int(clean_number(country_area[0]))
     else:
         return None
 
 
-def get_country_government(infobox):
+def get_country_government(rows):
     """
     extract government types from the country info
     box. There can be more than one, so a dict is returned
     with types and links to wikipages of the types.
-    :param infobox: lxml.html element of the infobox.
+    :param rows: infobox row index, see index_infobox_rows
     :return: dictionary gov_type_name -> gove_type_wiki_link
     """
     government_dict = {}  # maps government types to wiki pages repersenting them
-    government_items = infobox.xpath("descendant::tr[descendant::a[contains(text(), 'Government')] or descendant::th[contains(text(), 'Government')]]/td//node()")
+    government_items = [node for row in rows['government'] for node in ROW_TD_NODES(row)]
     for gov_i in government_items:
         if isinstance(gov_i, html.HtmlElement) and gov_i.tag == 'a':  # only take the de jure government types
             if ('title' in gov_i.attrib) and (gov_i.attrib['title'] == "De jure" or gov_i.attrib['title'] == "De facto"):
@@ -206,18 +235,19 @@ def get_country_government(infobox):
 
 
 def get_country_infobox(country_link):
-    res = requests.get(country_link)
-    page = html.fromstring(res.content)
-    info_box = page.xpath("//table[contains(@class, 'infobox')][1]")
-    assert (len(info_box) > 0)
-    return info_box[0]
+    # stream parse, stopping once the infobox is closed
+    info_box = parse_first_element(fetch(country_link), is_infobox)
+    if info_box is None:
+        raise FetchError("no infobox found: " + country_link)
+    return info_box
 
 
 def get_country_info(country_link, with_prime, with_presi):
     """
     return dict of information about country, including:
-    - prime minister name + link to wiki page + bday
-    - president name + link to wiki page + bday
+    - prime minister name + link to wiki page
+    - president name + link to wiki page
+      (leader birthdays are left None, see fetch_leader_birthdays)
     - area of country
     - population
     - types of government (can match a number of types)
@@ -228,6 +258,7 @@ def get_country_info(country_link, with_prime, with_presi):
     """
     # get the page infobox
     info_box = get_country_infobox(country_link)
+    rows = index_infobox_rows(info_box)
 
     # prepare dictionary for data
     info_dict = {'prime_minister_name' : None,
@@ -242,25 +273,25 @@ def get_country_info(country_link, with_prime, with_presi):
                  }
 
     # get president name and link if exist
-    pres_name, pres_link, pres_bday = get_country_president(info_box)
+    pres_name, pres_link = get_country_president(rows)
     if not pres_name and country_link in with_presi:
         print('no president found: ', country_link)
     else:
         info_dict['president_name'] = pres_name
         info_dict['president_link'] = pres_link
-        info_dict['president_bday'] = pres_bday
+        info_dict['president_bday'] = None  # filled by fetch_leader_birthdays
 
     # get prime minister and link if exist
-    prime_name, prime_link, prime_bday = get_country_prime(info_box)
+    prime_name, prime_link = get_country_prime(rows)
     if not prime_name and country_link in with_prime:
         print('no prime found: ', country_link)
     else:
         info_dict['prime_minister_name'] = prime_name
         info_dict['prime_minister_link'] = prime_link
-        info_dict['prime_minister_bday'] = prime_bday
+        info_dict['prime_minister_bday'] = None  # filled by fetch_leader_birthdays
 
     # get capital city
-    capital, capital_link = get_country_capital(info_box)
+    capital, capital_link = get_country_capital(rows)
     if capital:
         info_dict['capital_city'] = capital
         info_dict['capital_city_link'] = capital_link
@@ -268,21 +299,21 @@ def get_country_info(country_link, with_prime, with_presi):
         print('no capital found: ', country_link)
 
     # get country area
-    country_area = get_country_area(info_box)
+    country_area = get_country_area(rows)
     if country_area:
         info_dict['area'] = country_area
     else:
         print('no area found :', country_link)
 
     # get country population estimate
-    population_estimate = get_country_population(info_box)
+    population_estimate = get_country_population(rows)
     if population_estimate:
         info_dict['population'] = population_estimate
     else:
         print('no population found: ', country_link)
 
     # get government types - there can be many!
-    government_dict = get_country_government(info_box)
+    government_dict = get_country_government(rows)
     info_dict['government_types'] = government_dict if len(government_dict) else None
 
     # add country link
@@ -290,127 +321,80 @@ def get_country_info(country_link, with_prime, with_presi):
     return info_dict
 
 
-def build_ontology_from_info(country_info):
+def build_ontology_from_info(country_info, out_path):
     """
-    creates an onotology with the following relations:
-        <person> <president_of> <country>
-        <person> <prime_minister_of> <country>
-        <country> <population> <number>
-        <country> <area> <number>
-        <government_type> <is_government_type_of> <country>
-        <country> <has_government_type> <government_type>
-        <city> <capital_of> <country>
-        <person> <birthday> <date>
-        <name> <is_a> <country>
-        <name> <is_a> <city>
-        <name> <is_a> <person>
-        <person> <job> <president / prime_minister>
+    write the ontology of the given countries to out_path as
+    N-Triples. Triples are streamed to the file as they are
+    produced (see ntriples.country_triples for the relations),
+    instead of building an rdflib graph and serializing it.
     :param country_info: dictionary containing all relevant information
-    for each country in the world
-    :return: rdflib graph of the ontology.
+    for each country in the world, or an iterable of (country, info)
+    pairs such as iter_country_records streaming from a crawl log
+    :param out_path: path of the N-Triples output file
+    :return: number of triples written
+    """
+    with NTriplesWriter(out_path) as writer:
+        for triple in country_triples(country_info):
+            writer.add(*triple)
+    return writer.count
+
+
+def main(workers=DEFAULT_WORKERS, log_path=CRAWL_LOG_PATH, resume=False):
+    """
+    crawl every country, recording each result to the crawl
+    log as soon as it completes, then build the ontology by
+    streaming the log.
+    :param workers: number of pages crawled concurrently
+    :param log_path: path of the JSON Lines crawl log
+    :param resume: skip countries and birthdays already in the log
     """
-    ontology_graph = rdflib.Graph()
-
-    # basic entities for use in relations
-    country = URIRef('https://en.wikipedia.org/wiki/Country')
-    person = URIRef('https://en.wikipedia.org/wiki/Person')
-    job = URIRef('https://en.wikipedia.org/wiki/Job')
-    city = URIRef("https://en.wikipedia.org/wiki/City")
-    president = URIRef("https://en.wikipedia.org/wiki/President")
-    prime_minister = URIRef("https://en.wikipedia.org/wiki/Prime_minister")
-    capital = URIRef("https://en.wikipedia.org/wiki/Capital_city")
-    population = URIRef("https://en.wikipedia.org/wiki/Population")
-    area = URIRef("https://en.wikipedia.org/wiki/Area")
-    is_a = URIRef("https://en.wikipedia.org/wiki/Is-a")
-    government_type = URIRef("https://en.wikipedia.org/wiki/Government")
-    type_to_country = URIRef("http://example.org/government_to_country")
-    birthday = URIRef("https://en.wikipedia.org/wiki/Birthday")
-
-    # add relations for each country
-    for country_name, cdata in country_info.items():
-        clink = URIRef(cdata['country_link'])
-        # add to is_a country relation
-        ontology_graph.add((clink, is_a, country))
-
-        # add capital city to ontology relations
-        if cdata['capital_city_link']:
-            capital_link = URIRef(WIKIPEDIA_BASE_URL + cdata['capital_city_link'])
-            ontology_graph.add((capital_link, is_a, city))  # add to is_a city
-            ontology_graph.add((capital_link, capital, clink))
-
-        # add the prime minister
-        if cdata['prime_minister_link']:
-            pmlink = URIRef(WIKIPEDIA_BASE_URL + cdata['prime_minister_link'])
-            ontology_graph.add((pmlink, is_a, person))  # make person
-            ontology_graph.add((pmlink, prime_minister, clink))  # make prime
-            ontology_graph.add((pmlink, job, prime_minister))
-            # add birthday
-            if cdata['prime_minister_bday']:
-                prime_bday = Literal(cdata['prime_minister_bday'], datatype=XSD.date)
-                ontology_graph.add((pmlink, birthday, prime_bday))
-
-        # add the president
-        if cdata['president_link']:
-            prlink = URIRef(WIKIPEDIA_BASE_URL + cdata['president_link'])
-            ontology_graph.add((prlink, is_a, person))
-            ontology_graph.add((prlink, president, clink))
-            ontology_graph.add((prlink, job, president))
-            # add birthday
-            if cdata['president_bday']:
-                pres_bday = Literal(cdata['president_bday'], datatype=XSD.date)
-                ontology_graph.add((prlink, birthday, pres_bday))
-
-        # add the population
-        if cdata['population']:
-            ontology_graph.add((clink, population, Literal(cdata['population'], datatype=XSD.positiveInteger)))
-
-        # add the area
-        if cdata['area']:
-            ontology_graph.add((clink, area, Literal(cdata['area'], datatype=XSD.positiveInteger)))
-
-        # add government types
-        if cdata['government_types']:
-            for gt in cdata['government_types'].values():
-                glink = URIRef(WIKIPEDIA_BASE_URL + gt)
-                ontology_graph.add((clink, government_type, glink))  # country to type
-                ontology_graph.add((glink, type_to_country, clink))  # type to country
-    return ontology_graph
-
-
-def main():
     # get links to country wikipedia pages
     country_links = get_country_links(COUNTRY_WIKI_URL)
+    full_links = {country: WIKIPEDIA_BASE_URL + link for country, link in country_links.items()}
+
+    # skip what a previous, interrupted run already recorded
+    done_countries, known_bdays = read_crawl_progress(log_path) if resume else (set(), {})
+    if done_countries:
+        print('resuming, {} countries already recorded'.format(len(done_countries)))
+    full_links = {country: link for country, link in full_links.items() if country not in done_countries}
 
     # get lists of contries with prime ministers and presidents
-    with_presi = get_countries_with_presidents()
-    with_prime = get_countries_with_primes()
-
-    # get details about each country
-    country_data = {}
-    for country, link in country_links.items():
-        print('working on: ', country)
-        full_link = WIKIPEDIA_BASE_URL + link
-        cinfo = get_country_info(full_link, with_prime, with_presi)
-        country_data[country] = cinfo
-
-    # save country data
-    pickle_name = 'country_info.p'
-    with open(pickle_name, 'wb') as out:
-        pickle.dump(country_data, out)
-        print("saved: ", pickle_name)
+    leaders = get_state_leaders()
+    with_presi = leaders['president']
+    with_prime = leaders['prime_minister']
+
+    with CrawlLog(log_path, resume=resume) as log:
+        # get details about each country
+        crawl_countries(full_links,
+                        lambda link: get_country_info(link, with_prime, with_presi),
+                        workers=workers, on_result=log.write_country)
+        log.sync()
+
+        # fetch each unique leader page once for the birthdays
+        leader_links = leader_links_of(info for _, info in iter_country_records(log_path))
+        leader_links = [link for link in leader_links if link not in known_bdays]
+        fetch_leader_birthdays(leader_links, get_pres_prime_bday, WIKIPEDIA_BASE_URL,
+                               workers=workers, on_result=log.write_bday)
+    print("saved: ", log_path)
 
     # create the ontology and save it
-    ontology = build_ontology_from_info(country_data)
-    ontology.serialize('ontology.nt', format='nt')
+    build_ontology_from_info(iter_country_records(log_path), 'ontology.nt')
 
 
-def main1():
-    country_data = pickle.load(open('country_info.p', 'rb'))
-    ontology = build_ontology_from_info(country_data)
-    ontology.serialize('ontology.nt', format='nt')
+def main1(log_path=CRAWL_LOG_PATH):
+    build_ontology_from_info(iter_country_records(log_path), 'ontology.nt')
 
 
     return 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='crawl wikipedia and build ontology.nt')
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--log", type=str, default=CRAWL_LOG_PATH,
+                        help="JSON Lines file every crawled country is recorded to")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip countries already recorded in the log")
+    args = parser.parse_args()
+
+    configure_cache()
+    main(workers=args.workers, log_path=args.log, resume=args.resume)
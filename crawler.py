@@ -0,0 +1,334 @@
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from wiki_fetch import FetchError
+
+
+# default number of country pages crawled at the same time
+DEFAULT_WORKERS = 8
+
+
+def crawl_countries(country_links, get_info, workers=DEFAULT_WORKERS, max_in_flight=None, on_result=None):
+    """
+    run get_info over every country link, using a pool
+    of worker threads. At most max_in_flight countries are
+    submitted at any time, so the number of open requests
+    stays bounded no matter how many countries there are.
+    results are returned in the order of country_links,
+    regardless of the order in which pages finished.
+    countries whose page could not be fetched are reported
+    and left out, instead of aborting the whole crawl.
+    :param country_links: ordered dict country name -> full wiki link
+    :param get_info: callable taking a full link, returning an info dict
+    :param workers: number of worker threads, 1 crawls sequentially
+    :param max_in_flight: max submitted countries, defaults to 2 * workers
+    :param on_result: optional callable (country, info), called from the
+    calling thread as soon as each country completes
+    :return: dict country name -> info dict, in input order
+    """
+    if workers <= 1:
+        country_data = {}
+        for country, link in country_links.items():
+            print('working on: ', country)
+            try:
+                country_data[country] = get_info(link)
+            except FetchError as e:
+                print('skipping {}: {}'.format(country, e))
+                continue
+            if on_result is not None:
+                on_result(country, country_data[country])
+        return country_data
+
+    if max_in_flight is None:
+        max_in_flight = 2 * workers
+
+    results = {}
+    pending = {}  # maps futures to country names
+    link_iter = iter(country_links.items())
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # keep the window of submitted countries full
+            for country, link in link_iter:
+                print('working on: ', country)
+                pending[pool.submit(get_info, link)] = country
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                country = pending.pop(future)
+                try:
+                    results[country] = future.result()
+                except FetchError as e:
+                    print('skipping {}: {}'.format(country, e))
+                    continue
+                except Exception:
+                    print('failed on: ', country)
+                    for other in pending:
+                        other.cancel()
+                    raise
+                if on_result is not None:
+                    on_result(country, results[country])
+
+    # deterministic output, same order as the country list
+    return {country: results[country] for country in country_links if country in results}
+
+
+def fetch_leader_birthdays(leader_links, get_bday, base_url, workers=DEFAULT_WORKERS, on_result=None):
+    """
+    fetch the birthday of each leader link once, in one
+    batch on the worker pool.
+    :param leader_links: iterable of relative leader links
+    :param get_bday: callable taking a full leader link, returning a bday string
+    :param base_url: prefix of the relative leader links
+    :param workers: number of worker threads
+    :param on_result: optional callable (link, bday), called as each completes
+    :return: dict leader link -> bday
+    """
+    leader_links = list(dict.fromkeys(leader_links))
+    print('resolving birthdays of {} leaders'.format(len(leader_links)))
+    full_links = [base_url + link for link in leader_links]
+    bdays = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for link, bday in zip(leader_links, pool.map(get_bday, full_links)):
+            bdays[link] = bday
+            if on_result is not None:
+                on_result(link, bday)
+    return bdays
+
+
+def leader_links_of(country_infos):
+    """
+    :param country_infos: iterable of country info dicts
+    :return: list of the distinct president / prime minister links
+    """
+    links = {}
+    for cdata in country_infos:
+        for key in ('president_link', 'prime_minister_link'):
+            if cdata.get(key):
+                links[cdata[key]] = None
+    return list(links)
+
+
+def resolve_leader_birthdays(country_data, get_bday, base_url, workers=DEFAULT_WORKERS):
+    """
+    fill in president_bday / prime_minister_bday for all
+    crawled countries. Leader links are collected first, so a
+    person who leads several countries (or is both president
+    and prime minister) has their page fetched only once, and
+    the unique pages are fetched by the worker pool in one batch.
+    :param country_data: dict country name -> info dict, updated in place
+    :param get_bday: callable taking a full leader link, returning a bday string
+    :param base_url: prefix of the relative leader links
+    :param workers: number of worker threads
+    :return: dict leader link -> bday
+    """
+    # birthdays already known, e.g. from countries reused by an incremental build
+    known = {}
+    for cdata in country_data.values():
+        for key in ('president', 'prime_minister'):
+            if cdata.get(key + '_link') and cdata.get(key + '_bday'):
+                known[cdata[key + '_link']] = cdata[key + '_bday']
+
+    leader_links = [link for link in leader_links_of(country_data.values()) if link not in known]
+    bdays = fetch_leader_birthdays(leader_links, get_bday, base_url, workers)
+    bdays.update(known)
+    fill_leader_birthdays(country_data.values(), bdays)
+    return bdays
+
+
+def fill_leader_birthdays(country_infos, bdays):
+    """
+    set president_bday / prime_minister_bday from a dict
+    of leader link -> bday.
+    :param country_infos: iterable of country info dicts, updated in place
+    :param bdays: dict leader link -> bday
+    """
+    for cdata in country_infos:
+        if cdata.get('president_link'):
+            cdata['president_bday'] = bdays.get(cdata['president_link'])
+        if cdata.get('prime_minister_link'):
+            cdata['prime_minister_bday'] = bdays.get(cdata['prime_minister_link'])
+
+
+def load_build_state(state_path):
+    """
+    load the per-country state saved by the previous build.
+    :param state_path: path of the state pickle
+    :return: dict country link -> {'page_hash', 'info'}, empty if missing
+    """
+    if not os.path.isfile(state_path):
+        return {}
+    with open(state_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_build_state(state_path, state):
+    with open(state_path, 'wb') as out:
+        pickle.dump(state, out)
+
+
+def make_incremental(get_info, fetch_page, previous_state, state, changed):
+    """
+    wrap get_info so a country page whose content hash is
+    unchanged since the previous build reuses the previously
+    extracted info instead of being extracted again.
+    :param get_info: callable (link, page content) -> info dict
+    :param fetch_page: callable link -> page content (bytes)
+    :param previous_state: state of the previous build (see load_build_state)
+    :param state: dict filled with the state of this build
+    :param changed: dict filled with link -> whether the page changed;
+    the worker threads don't print, the caller reports it in order
+    :return: callable link -> info dict, for use with crawl_countries
+    """
+    def get_info_incremental(link):
+        page = fetch_page(link)
+        page_hash = hashlib.sha256(page).hexdigest()
+        previous = previous_state.get(link)
+        changed[link] = previous is None or previous['page_hash'] != page_hash
+        if changed[link]:
+            info = get_info(link, page)
+        else:
+            info = previous['info']
+        state[link] = {'page_hash': page_hash, 'info': info}
+        return info
+    return get_info_incremental
+
+
+def write_ntriples_delta(old_lines, new_path, delta_path):
+    """
+    write the triples added and removed between two N-Triples
+    dumps, one per line in RDF Patch style:
+        A <s> <p> <o> .   (added)
+        D <s> <p> <o> .   (removed)
+    :param old_lines: set of triple lines of the previous ontology
+    :param new_path: path of the new N-Triples file
+    :param delta_path: path of the delta file to write
+    :return: tuple of added and removed counts
+    """
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new_lines = set(line.strip() for line in f if line.strip())
+
+    added = sorted(new_lines - old_lines)
+    removed = sorted(old_lines - new_lines)
+    with open(delta_path, 'w', encoding='utf-8') as out:
+        for line in removed:
+            out.write('D ' + line + '\n')
+        for line in added:
+            out.write('A ' + line + '\n')
+    return len(added), len(removed)
+
+
+def read_ntriples_lines(nt_path):
+    """
+    :return: set of triple lines in an N-Triples file, empty if missing
+    """
+    if not os.path.isfile(nt_path):
+        return set()
+    with open(nt_path, 'r', encoding='utf-8') as f:
+        return set(line.strip() for line in f if line.strip())
+
+
+def _truncate_torn_line(log_path):
+    """
+    cut a partial last line, left by a crash in the middle
+    of a write, so appended records start on a fresh line.
+    """
+    if not os.path.isfile(log_path):
+        return
+    with open(log_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+
+class CrawlLog:
+    """
+    durable append-only JSON Lines record of a crawl. Each
+    line is one of:
+        {"type": "country", "country": name, "info": info dict}
+        {"type": "bday", "link": leader link, "bday": bday}
+    records are flushed and fsynced every fsync_every records
+    (and on close), so a crash loses at most one batch.
+    """
+
+    def __init__(self, log_path, resume=False, fsync_every=16):
+        self.fsync_every = fsync_every
+        self.unsynced = 0
+        if resume:
+            _truncate_torn_line(log_path)
+        self.out = open(log_path, 'a' if resume else 'w', encoding='utf-8')
+
+    def _write(self, record):
+        self.out.write(json.dumps(record) + '\n')
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every:
+            self.sync()
+
+    def write_country(self, country, info):
+        self._write({'type': 'country', 'country': country, 'info': info})
+
+    def write_bday(self, link, bday):
+        self._write({'type': 'bday', 'link': link, 'bday': bday})
+
+    def sync(self):
+        self.out.flush()
+        os.fsync(self.out.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        self.sync()
+        self.out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_crawl_log(log_path):
+    """
+    yield the records of a crawl log. A torn last line,
+    left by a crash in the middle of a write, is skipped.
+    """
+    if not os.path.isfile(log_path):
+        return
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def read_crawl_progress(log_path):
+    """
+    :return: tuple of the set of countries already recorded
+    and dict leader link -> bday of recorded birthdays
+    """
+    countries, bdays = set(), {}
+    for record in iter_crawl_log(log_path):
+        if record['type'] == 'country':
+            countries.add(record['country'])
+        else:
+            bdays[record['link']] = record['bday']
+    return countries, bdays
+
+
+def iter_country_records(log_path):
+    """
+    stream (country, info) pairs from a crawl log, with the
+    leader birthdays filled in. Only the birthdays are held
+    in memory, the country records are read one at a time.
+    """
+    _, bdays = read_crawl_progress(log_path)
+    for record in iter_crawl_log(log_path):
+        if record['type'] == 'country':
+            info = record['info']
+            fill_leader_birthdays([info], bdays)
+            yield record['country'], info
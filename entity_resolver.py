@@ -0,0 +1,181 @@
+from collections import Counter
+
+
+# length of the character n-grams of the inverted index
+NGRAM_SIZE = 3
+# number of names, by shared n-grams, re-ranked by edit distance
+RERANK_CANDIDATES = 20
+
+
+def ngrams(name, n=NGRAM_SIZE):
+    """
+    :param name: normalized name
+    :return: set of the character n-grams of the name, padded
+    so that its start and end make n-grams of their own
+    """
+    padded = '^' + name + '$'
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def edit_distance(a, b, max_distance=None):
+    """
+    optimal string alignment distance: the number of insertions,
+    deletions, substitutions and transpositions of adjacent
+    characters turning a into b.
+    :param max_distance: stop as soon as the distance is known
+    to be larger, returning max_distance + 1
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is None:
+        max_distance = len(a)
+    if len(a) - len(b) > max_distance:
+        return max_distance + 1
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        a_char = a[i - 1]
+        for j in range(1, len(b) + 1):
+            if a_char == b[j - 1]:
+                distance = previous[j - 1]
+            else:
+                distance = 1 + min(previous[j], current[j - 1], previous[j - 1])
+                if i > 1 and j > 1 and a_char == b[j - 2] and a[i - 2] == b[j - 1] \
+                        and before_previous[j - 2] + 1 < distance:
+                    distance = before_previous[j - 2] + 1
+            current[j] = distance
+        if min(current) > max_distance:
+            return max_distance + 1
+        before_previous, previous = previous, current
+    return previous[len(b)]
+
+
+def similarity(a, b):
+    """
+    :return: 1 - edit distance relative to the longer name,
+    1.0 for equal names and 0.0 for nothing in common
+    """
+    longest = max(len(a), len(b))
+    if not longest:
+        return 1.0
+    return 1.0 - edit_distance(a, b) / longest
+
+
+class EntityResolver:
+    """
+    resolve normalized entity names, possibly misspelled, to
+    the values (uris) registered under them. An exact name is
+    found with one dict lookup; otherwise the names sharing the
+    most character n-grams with the query are taken from an
+    inverted index and re-ranked by edit distance, so a lookup
+    never scans all the names. Names one swap of adjacent
+    characters away are also looked up directly. Names shorter
+    than a minimum length are only ever matched exactly: one edit
+    in a short name leaves too little of it to tell it apart.
+    """
+
+    def __init__(self, ngram_size=NGRAM_SIZE, candidates=RERANK_CANDIDATES):
+        self.ngram_size = ngram_size
+        self.candidates = candidates
+        self.names = []  # name id -> name
+        self.values = []  # name id -> list of values
+        self.name_ids = {}  # name -> name id
+        self.postings = {}  # n-gram -> list of name ids
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.name_ids
+
+    def add(self, name, value):
+        """
+        register a value under a name. A name may hold several
+        values (e.g. people sharing a surname).
+        :param name: normalized name
+        :param value: value returned when the name is resolved
+        """
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+            self.values.append([])
+            for gram in ngrams(name, self.ngram_size):
+                self.postings.setdefault(gram, []).append(name_id)
+        if value not in self.values[name_id]:
+            self.values[name_id].append(value)
+
+    def _best_name(self, name, min_confidence, min_length):
+        if len(name) < min_length:
+            return None, min_confidence
+        grams = ngrams(name, self.ngram_size)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        best_id, best_score = None, min_confidence
+        # a swap of adjacent characters, the most common typo, can
+        # leave a short name no n-gram in common with the query, or
+        # too few to be a candidate: those names are looked up as is
+        for i in range(len(name) - 1):
+            if name[i] == name[i + 1]:
+                continue
+            name_id = self.name_ids.get(name[:i] + name[i + 1] + name[i] + name[i + 2:])
+            if name_id is None:
+                continue
+            score = 1.0 - 1.0 / len(name)
+            if score > best_score or (score == best_score and
+                                      (best_id is None or self.names[name_id] < self.names[best_id])):
+                best_id, best_score = name_id, score
+        for name_id, _ in shared.most_common(self.candidates):
+            candidate = self.names[name_id]
+            if len(candidate) < min_length:
+                continue
+            longest = max(len(name), len(candidate))
+            # an edit changes at most ngram_size + 1 n-grams (a
+            # transposition of adjacent characters), so the n-grams
+            # missing from the candidate bound the distance
+            lower_bound = max(abs(len(name) - len(candidate)),
+                              -(-(len(grams) - shared[name_id]) // (self.ngram_size + 1)))
+            if 1.0 - lower_bound / longest < best_score:
+                continue
+            max_distance = int((1.0 - best_score) * longest + 1e-9)
+            score = 1.0 - edit_distance(name, candidate, max_distance) / longest
+            if score > best_score or (score == best_score and
+                                      (best_id is None or candidate < self.names[best_id])):
+                best_id, best_score = name_id, score
+        return best_id, best_score
+
+    def resolve_all(self, name, min_confidence=0.0, min_length=0):
+        """
+        :param name: normalized name
+        :param min_confidence: lowest similarity accepted for a
+        name that is not registered as is
+        :param min_length: shortest name, queried or registered,
+        matched other than exactly
+        :return: tuple of the values of the best matching name and
+        the confidence of the match, from 0.0 to 1.0 (exact name);
+        ([], 0.0) if no name is similar enough
+        """
+        name_id = self.name_ids.get(name)
+        if name_id is not None:
+            return list(self.values[name_id]), 1.0
+        name_id, confidence = self._best_name(name, min_confidence, min_length)
+        if name_id is None:
+            return [], 0.0
+        return list(self.values[name_id]), confidence
+
+    def resolve(self, name, min_confidence=0.0, min_length=0):
+        """
+        :param name: normalized name
+        :param min_confidence: see resolve_all
+        :param min_length: see resolve_all
+        :return: tuple of the best value and the confidence of the
+        match, or (None, 0.0) if no name is similar enough
+        """
+        values, confidence = self.resolve_all(name, min_confidence, min_length)
+        if not values:
+            return None, 0.0
+        return values[0], confidence
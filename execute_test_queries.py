@@ -1,63 +1,91 @@
-import rdflib
+from query_registry import register_query, run_query
+import argparse
+from rdflib import URIRef, Literal
+from ntriples import government_category_link, government_categories
+from snapshot import load_graph
 
 
-def prime_minister_count_query(ontology):
-    q = """
+register_query('prime_minister_count', """
     select (COUNT(distinct ?person) as ?sum)
     WHERE
     {
         ?person <https://en.wikipedia.org/wiki/Is-a> <https://en.wikipedia.org/wiki/Person> .
         ?person <https://en.wikipedia.org/wiki/Job> <https://en.wikipedia.org/wiki/Prime_minister> .
     }
-    """
-    res = ontology.query(q)
-    return list(res)
+    """)
 
 
-def country_count_query(ontology):
-    q = """
+def prime_minister_count_query(ontology):
+    return run_query(ontology, 'prime_minister_count')
+
+
+register_query('country_count', """
         SELECT(COUNT(distinct ?country) as ?sum)
         WHERE
         {
         ?country <https://en.wikipedia.org/wiki/Is-a> <https://en.wikipedia.org/wiki/Country>.
         }
-        """
-    res = ontology.query(q)
-    return list(res)
+        """)
+
+
+def country_count_query(ontology):
+    return run_query(ontology, 'country_count')
+
+
+# the government type counts are written with the ontology (see
+# ntriples.GOVERNMENT_CATEGORIES): one lookup of the category's count
+register_query('government_category_count', """
+        select ?sum
+        WHERE
+        {
+            ?category <http://example.org/country_count> ?sum .
+        }
+        """)
+
+
+def government_category_count_query(ontology, category):
+    return run_query(ontology, 'government_category_count',
+                     category=URIRef(government_category_link(category)))
 
 
 def republic_count_query(ontology):
-    q = """
-        select (COUNT(distinct ?country) as ?num_republics)
+    return government_category_count_query(ontology, 'republic')
+
+
+def monarchy_count_query(ontology):
+    return government_category_count_query(ontology, 'monarchy')
+
+
+# the government type pages with a word in their link, as the republic
+# and monarchy counts matched them before the categories were written
+register_query('government_pages_with_word', """
+        select distinct ?gov
         WHERE
         {
-            ?country <https://en.wikipedia.org/wiki/Is-a> <https://en.wikipedia.org/wiki/Country> .
             ?country <https://en.wikipedia.org/wiki/Government> ?gov .
-            FILTER ( contains(str(?gov), "Republic") || contains(str(?gov), "republic"))
+            FILTER(contains(lcase(str(?gov)), ?word))
         }
-        """
-    res = ontology.query(q)
-    return list(res)
+        """)
 
 
-def monarchy_count_query(ontology):
-    q = """
-    select (COUNT(distinct ?country) as ?sum)
-    WHERE
-    {
-        ?country <https://en.wikipedia.org/wiki/Is-a> <https://en.wikipedia.org/wiki/Country> .
-        ?country <https://en.wikipedia.org/wiki/Government> ?gov .
-        FILTER(contains(str(?gov), "monarchy") || contains(str(?gov), "Monarchy"))
-    }
+def uncategorized_government_pages(ontology, category):
+    """
+    :param category: key of GOVERNMENT_CATEGORIES that is also a word,
+    republic or monarchy
+    :return: government type pages with the word in them that are not
+    in the category
     """
-    res = ontology.query(q)
-    return list(res)
+    pages = run_query(ontology, 'government_pages_with_word', word=Literal(category))
+    return sorted(str(gov) for gov, in pages if category not in government_categories(str(gov)))
 
 
-def main():
-    # load ontology
-    country_graph = rdflib.Graph()
-    country_graph.parse("ontology.nt", format="nt")
+def main(store="memory"):
+    # load ontology, into rdflib's in-memory store or the array store
+    if store == "array":
+        from array_store import load_array_graph
+        country_graph = load_array_graph("ontology.nt")
+    else:
+        country_graph = load_graph("ontology.nt")
 
     # prime minister count
     pm_count = prime_minister_count_query(country_graph)
@@ -83,8 +111,17 @@ def main():
     for r in monarchy_count:
         print(r)
 
+    # every republic / monarchy page is counted
+    for category in ('republic', 'monarchy'):
+        missing = uncategorized_government_pages(country_graph, category)
+        if missing:
+            print("Error: government types not counted as {}: {}".format(category, ", ".join(missing)))
+            exit(1)
+
     return 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='test queries over ontology.nt')
+    parser.add_argument("--store", type=str, choices=["memory", "array"], default="memory")
+    main(parser.parse_args().store)
     print('Done.')
\ No newline at end of file
@@ -0,0 +1,335 @@
+from lxml import html
+import lxml
+from crawler import crawl_countries, resolve_leader_birthdays, DEFAULT_WORKERS
+from crawler import load_build_state, save_build_state, make_incremental
+from crawler import read_ntriples_lines, write_ntriples_delta
+from infobox import parse_first_element, is_infobox, is_bday
+from infobox import index_infobox_rows, ROW_FIRST_TD_LINK, ROW_NESTED_TD_LINK, ROW_CAPITAL_LINK
+from infobox import ROW_FIRST_TD_TEXT, ROW_TD_TEXTS, ROW_TD_NODES
+from ntriples import NTriplesWriter, country_triples
+from snapshot import write_snapshot
+from ontology_index import write_index
+from question_classifier import normalize_text
+from wiki_fetch import fetch, FetchError
+
+
+# basic urls
+COUNTRY_WIKI_URL = "https://en.wikipedia.org/wiki/List_of_countries_and_dependencies_by_population"
+WIKIPEDIA_BASE_URL = "https://en.wikipedia.org"
+
+# ---------------------------------------------#
+# ------FUNCTIONS FOR BUILDING ONTOLOGY--------#
+# ---------------------------------------------#
+
+def clean_number(num_string):
+    """
+    remove none numeric chars from string repersenting
+    a number. if string doesn't repersent a number at
+    all, this will throw an exception.
+    :param num_string: string repersenting a number
+    :return: integer of the repersented number
+    """
+    clean_num = ''.join([c for c in num_string if str.isnumeric(c)])
+    if len(clean_num) > 0:
+        return int(clean_num)
+    else:
+        return None
+
+
+def get_country_links(countries_wiki_url):
+    """
+    given a url to the wikipedia page listing all
+    countries in the world, return a dictionary mapping
+    country names to links to their respective wikipedia
+    pages.
+    :param countries_wiki_url: link
+    :return: name (str) -> link dict (str)
+    """
+    # get page and parse it
+    country_page = html.fromstring(fetch(countries_wiki_url))
+
+    # get links for countries that are not territories of another country
+    non_teritories = country_page.xpath("//table[1]//td[descendant::span[@class='flagicon'] or descendant::a[@title and @href]]/a[@title and @href]")
+    teritories = country_page.xpath("//table[1]//td/i[a[@href and @title]][1]/a[not(@class)][1]")
+
+    # union for iteration
+    country_link_elements = non_teritories + teritories
+
+    country_links = {}  # maps country names to links
+    for link in country_link_elements:
+        if 'title' in link.attrib:
+            normed_name = normalize_text(link.text)
+            country_links[normed_name] = link.attrib['href']
+
+    return country_links
+
+
+def get_pres_prime_bday(president_link):
+    """
+    get the birthday string of the president
+    birth day from wikipedia page
+    :param president_link: link to president wikipedia page
+    :return: string repersenting birth date
+    """
+    try:
+        content = fetch(president_link)
+    except FetchError as e:
+        print(e)
+        return None
+    # the bday span sits in the infobox, no need to parse the rest of the article
+    bday = parse_first_element(content, is_bday)
+    return bday.text if bday is not None else None
+
+
+def get_country_population(rows):
+    """
+    extract the estimated population of a country
+    from it's infobox. If more than one estimate
+    exists, the first is taken (usually latest)
+    :param rows: infobox row index, see index_infobox_rows
+    :return: population (int) or None of missing.
+    """
+    value_row = rows.get('population_value')
+    population_estimate = ROW_TD_TEXTS(value_row) if value_row is not None else []
+    if len(population_estimate) > 0:
+        estimate_strings = [e for e in population_estimate[0].split(" ") if not e.isspace() if e]
+        pop_num = clean_number(estimate_strings[0])
+        assert pop_num
+        return pop_num
+    else:
+        return None
+
+
+def get_country_prime(rows):
+    """
+    extract prime minister name and wiki link from
+    infobox. The birthday is resolved later, once per
+    unique leader page, by resolve_leader_birthdays.
+    :param rows: infobox row index, see index_infobox_rows
+    :return: tuple of name and link, or None if missing
+    from infobox.
+    """
+    # get prime minister and link if exist
+    prime_row = rows.get('prime_minister')
+    priminister_a = ROW_FIRST_TD_LINK(prime_row) if prime_row is not None else []
+    if len(priminister_a) > 0:
+        name = normalize_text(priminister_a[0].attrib['title'])
+        link = priminister_a[0].attrib['href']
+        return name, link
+    else:
+        return None, None
+
+
+def get_country_president(rows):
+    """
+    extract president name and wiki link from
+    infobox. The birthday is resolved later, once per
+    unique leader page, by resolve_leader_birthdays.
+    :param rows: infobox row index, see index_infobox_rows
+    :return: tuple of name and link or None if
+    missing from infobox.
+    """
+    president_row = rows.get('president')
+    president_a = ROW_NESTED_TD_LINK(president_row) if president_row is not None else []
+    if len(president_a) > 0:
+        name = normalize_text(president_a[0].attrib['title'])
+        link = president_a[0].attrib['href']
+        return name, link
+    else:
+        return None, None
+
+
+def get_country_capital(rows):
+    """
+    extract capital city and link to it's wiki
+    page from infobox.
+    :param rows: infobox row index, see index_infobox_rows
+    :return: tuple of name and link
+    """
+    capital_row = rows.get('capital')
+    capital_a = ROW_CAPITAL_LINK(capital_row) if capital_row is not None else []
+    if len(capital_a) > 0:
+        name = normalize_text(capital_a[0].attrib['title'])
+        link = capital_a[0].attrib['href']
+        return name, link
+    else:
+        return None, None
+
+
+def get_country_area(rows):
+    """
+    extract total area of country in square km
+    from infobox.
+    :param rows: infobox row index, see index_infobox_rows
+    :return: area (int) or None if missing.
+    """
+    total_row = rows.get('total')
+    country_area = ROW_FIRST_TD_TEXT(total_row) if total_row is not None else []
+    area_strings = [a for a in country_area[0].split(" ") if not a.isspace() if a]
+    if len(country_area) > 0:
+        return int(clean_number(area_strings[0]))
+    else:
+        return None
+
+
+def get_country_government(rows):
+    """
+    extract government types from the country info
+    box. There can be more than one, so a dict is returned
+    with types and links to wikipages of the types.
+    :param rows: infobox row index, see index_infobox_rows
+    :return: dictionary gov_type_name -> gove_type_wiki_link
+    """
+    government_dict = {}  # maps government types to wiki pages repersenting them
+    government_items = [node for row in rows['government'] for node in ROW_TD_NODES(row)]
+    for gov_i in government_items:
+        if isinstance(gov_i, html.HtmlElement) and gov_i.tag == 'a':  # only take the de jure government types
+            if ('title' in gov_i.attrib) and (gov_i.attrib['title'] == "De jure" or gov_i.attrib['title'] == "De facto"):
+                break
+            elif 'href' in gov_i.attrib and 'title' in gov_i.attrib:  # only if it has a link
+                government_dict[normalize_text(gov_i.attrib['title'])] = gov_i.attrib['href']
+        elif isinstance(gov_i, lxml.etree._ElementUnicodeResult):
+            if ('de jure' in gov_i) or ('De jure' in gov_i) or ('De facto' in gov_i) or ('de facto' in gov_i):
+                break
+    return government_dict
+
+
+def get_country_infobox(country_link, page_content=None):
+    if page_content is None:
+        page_content = fetch(country_link)
+    # stream parse, stopping once the infobox is closed
+    info_box = parse_first_element(page_content, is_infobox)
+    if info_box is None:
+        raise FetchError("no infobox found: " + country_link)
+    return info_box
+
+
+def get_country_info(country_link, page_content=None):
+    """
+    return dict of information about country, including:
+    - prime minister name + link to wiki page
+    - president name + link to wiki page
+      (leader birthdays are left None, see resolve_leader_birthdays)
+    - area of country
+    - population
+    - types of government (can match a number of types)
+    - capital city
+    :param country_link: link to a wikipedia page of a country
+    :param page_content: already downloaded page, fetched if None
+    :return: dict of listed information about country. None in
+    place of missing data
+    """
+    # get the page infobox
+    info_box = get_country_infobox(country_link, page_content)
+    rows = index_infobox_rows(info_box)
+
+    # prepare dictionary for data
+    info_dict = {'prime_minister_name' : None,
+                 'prime_minister_link' : None,
+                 'president_name': None,
+                 'president_link': None,
+                 'area': None,
+                 'population': None,
+                 'government_types': None,
+                 'capital_city': None,
+                 'capital_city_link': None
+                 }
+
+    # get president name and link if exist
+    pres_name, pres_link = get_country_president(rows)
+    if pres_name:
+        info_dict['president_name'] = pres_name
+        info_dict['president_link'] = pres_link
+        info_dict['president_bday'] = None  # filled by resolve_leader_birthdays
+
+    # get prime minister and link if exist
+    prime_name, prime_link = get_country_prime(rows)
+    if prime_name:
+        info_dict['prime_minister_name'] = prime_name
+        info_dict['prime_minister_link'] = prime_link
+        info_dict['prime_minister_bday'] = None  # filled by resolve_leader_birthdays
+
+    # get capital city
+    capital, capital_link = get_country_capital(rows)
+    if capital:
+        info_dict['capital_city'] = capital
+        info_dict['capital_city_link'] = capital_link
+
+
+    # get country area
+    country_area = get_country_area(rows)
+    if country_area:
+        info_dict['area'] = country_area
+
+
+    # get country population estimate
+    population_estimate = get_country_population(rows)
+    if population_estimate:
+        info_dict['population'] = population_estimate
+
+
+    # get government types - there can be many!
+    government_dict = get_country_government(rows)
+    info_dict['government_types'] = government_dict if len(government_dict) else None
+
+    # add country link
+    info_dict['country_link'] = country_link
+    return info_dict
+
+
+def build_ontology_from_info(country_info, out_path):
+    """
+    write the ontology of the given countries to out_path as
+    N-Triples. Triples are streamed to the file as they are
+    produced (see ntriples.country_triples for the relations),
+    instead of building an rdflib graph and serializing it.
+    :param country_info: dictionary containing all relevant information
+    for each country in the world, or an iterable of (country, info)
+    pairs such as iter_country_records streaming from a crawl log
+    :param out_path: path of the N-Triples output file
+    :return: number of triples written
+    """
+    with NTriplesWriter(out_path) as writer:
+        for triple in country_triples(country_info):
+            writer.add(*triple)
+    return writer.count
+
+
+def main_build_ontology(out_path, workers=DEFAULT_WORKERS, incremental=False):
+    """
+    crawl wikipedia and write the ontology to out_path.
+    In incremental mode only country pages whose content
+    changed since the last build are extracted again, and
+    the added / removed triples are written to out_path.delta
+    :param out_path: path of the N-Triples output file
+    :param workers: number of pages crawled concurrently
+    :param incremental: reuse unchanged countries from the last build
+    """
+    # get links to country wikipedia pages
+    country_links = get_country_links(COUNTRY_WIKI_URL)
+    full_links = {country: WIKIPEDIA_BASE_URL + link for country, link in country_links.items()}
+
+    # get details about each country
+    state_path = out_path + '.state.p'
+    previous_state = load_build_state(state_path) if incremental else {}
+    old_triples = read_ntriples_lines(out_path) if incremental else set()
+    state, changed = {}, {}
+    get_info = make_incremental(get_country_info, fetch, previous_state, state, changed)
+    country_data = crawl_countries(full_links, get_info, workers=workers)
+    # reported once the crawl is done, in the order of the country list
+    for link in full_links.values():
+        if changed.get(link):
+            print('changed: ', link)
+    # fetch each unique leader page once for the birthdays
+    resolve_leader_birthdays(country_data, get_pres_prime_bday, WIKIPEDIA_BASE_URL, workers=workers)
+
+    # create the ontology and save it
+    build_ontology_from_info(country_data, out_path)
+    save_build_state(state_path, state)
+    write_snapshot(out_path)  # fast loading copy for the question commands
+    write_index(out_path)  # memory mapped index for serve --processes
+
+    if incremental:
+        added, removed = write_ntriples_delta(old_triples, out_path, out_path + '.delta')
+        print('delta: {} added, {} removed triples'.format(added, removed))
+    return
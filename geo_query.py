@@ -0,0 +1,468 @@
+import json
+import re
+from urllib.parse import unquote
+from rdflib import Graph, URIRef
+from query_registry import register_query, run_query
+from snapshot import load_graph
+from ontology_index import open_index
+from array_store import ArrayStore
+from answer_cache import AnswerCache, DEFAULT_CACHE_SIZE, ontology_fingerprint
+from qa_server import ANSWERED, NO_RESULTS, UNRECOGNIZED
+from question_classifier import parse_query, normalize_text
+from entity_resolver import EntityResolver
+
+
+WIKIPEDIA_BASE_URL = "https://en.wikipedia.org"
+
+# ---------------------------------------------#
+# -----------TEMPLATES FOR QUERIES-------------#
+# ---------------------------------------------#
+# templates are registered in query_registry, prepared once and run
+# with ?country (or ?cand for 'who') bound to a URI from the indexes.
+query_formats = {}
+
+# president query
+query_formats['presi'] = """SELECT ?person
+                            WHERE
+                            {
+                                ?country <https://en.wikipedia.org/wiki/Is-a> <https://en.wikipedia.org/wiki/Country> .
+                                ?person <https://en.wikipedia.org/wiki/President> ?country .
+                            }
+                         """
+# prime minister query
+query_formats['prime'] = """SELECT ?person
+                            WHERE
+                            {
+                                ?country <https://en.wikipedia.org/wiki/Is-a> <https://en.wikipedia.org/wiki/Country> .
+                                ?person <https://en.wikipedia.org/wiki/Prime_minister> ?country .
+                            }
+                         """
+# population query
+query_formats['popul'] = """SELECT ?population
+                            WHERE
+                            {
+                                ?country <https://en.wikipedia.org/wiki/Is-a> <https://en.wikipedia.org/wiki/Country> .
+                                ?country <https://en.wikipedia.org/wiki/Population> ?population .
+                            }
+                            """
+# area query
+query_formats['area'] = """SELECT ?area
+                           WHERE
+                           {
+                                ?country <https://en.wikipedia.org/wiki/Is-a> <https://en.wikipedia.org/wiki/Country> .
+                                ?country <https://en.wikipedia.org/wiki/Area> ?area .
+                           }
+                           """
+# capital query
+query_formats['capital'] = """SELECT ?capital
+                              WHERE
+                              {
+                                ?country <https://en.wikipedia.org/wiki/Is-a> <https://en.wikipedia.org/wiki/Country> .
+                                ?capital <https://en.wikipedia.org/wiki/Capital_city> ?country .
+                              }
+                              """
+# president birthday query
+query_formats['presi_bday'] = """SELECT ?bday
+                                 WHERE
+                                 {
+                                    ?country <https://en.wikipedia.org/wiki/Is-a> <https://en.wikipedia.org/wiki/Country> .
+                                    ?person <https://en.wikipedia.org/wiki/President> ?country .
+                                    ?person <https://en.wikipedia.org/wiki/Birthday> ?bday .
+                                 }
+                              """
+# prime minister birthday query
+query_formats['prime_bday'] = """SELECT ?bday
+                                 WHERE
+                                 {
+                                    ?country <https://en.wikipedia.org/wiki/Is-a> <https://en.wikipedia.org/wiki/Country> .
+                                    ?person <https://en.wikipedia.org/wiki/Prime_minister> ?country .
+                                    ?person <https://en.wikipedia.org/wiki/Birthday> ?bday .
+                                 }
+                              """
+# who is person query
+query_formats['who'] = """SELECT ?position ?country
+                          WHERE
+                          {
+                           ?cand <https://en.wikipedia.org/wiki/Job> ?position .
+                           ?cand ?position ?country
+                           }
+                        """
+# what is the government type of country
+query_formats['gov'] = """SELECT ?gov_type
+                          WHERE
+                          {
+                            ?country <https://en.wikipedia.org/wiki/Is-a> <https://en.wikipedia.org/wiki/Country> .
+                            ?country <https://en.wikipedia.org/wiki/Government> ?gov_type .
+                          }
+                       """
+
+for template_key, template in query_formats.items():
+    register_query(template_key, template)
+
+
+# ---------------------------------------------#
+# ------FUNCTIONS FOR PARSING QUERIES----------#
+# ---------------------------------------------#
+
+def get_response_string(query_key, result):
+    if query_key == "popul":
+        return "{:,}".format(int(result[0][0]))
+
+    elif query_key == "area":
+        return "{:,} km2".format(int(result[0][0]))
+
+    elif query_key in {'prime', 'presi', 'capital'}:
+        rem_base = result[0][0].replace(WIKIPEDIA_BASE_URL, "").replace("/wiki/", "")
+        return ' '.join([p.capitalize() for p in rem_base.split("_")])
+
+    elif query_key in {'presi_bday', 'prime_bday'}:
+        return result[0][0]
+
+    elif query_key == "gov":
+        type_list = []
+        for r in result:
+            clean_type = ' '.join([p.capitalize() for p in r[0].replace(WIKIPEDIA_BASE_URL, "").replace("/wiki/", "").split("_")])
+            type_list.append(clean_type)
+        return ", ".join(type_list)
+
+    elif query_key == "who":
+        res_list = []
+        for r in result:
+            pos = ' '.join(r[0].replace(WIKIPEDIA_BASE_URL, "").replace("/wiki/", "").split("_"))
+            country = ' '.join(r[1].replace(WIKIPEDIA_BASE_URL, "").replace("/wiki/", "").split("_"))
+            res_list.append(pos + " of " + country)
+        return ", ".join(res_list)
+    return
+
+
+IS_A_URI = URIRef("https://en.wikipedia.org/wiki/Is-a")
+COUNTRY_URI = URIRef("https://en.wikipedia.org/wiki/Country")
+PRESIDENT_URI = URIRef("https://en.wikipedia.org/wiki/President")
+PRIME_MINISTER_URI = URIRef("https://en.wikipedia.org/wiki/Prime_minister")
+CAPITAL_URI = URIRef("https://en.wikipedia.org/wiki/Capital_city")
+POPULATION_URI = URIRef("https://en.wikipedia.org/wiki/Population")
+AREA_URI = URIRef("https://en.wikipedia.org/wiki/Area")
+GOVERNMENT_URI = URIRef("https://en.wikipedia.org/wiki/Government")
+BIRTHDAY_URI = URIRef("https://en.wikipedia.org/wiki/Birthday")
+JOB_URI = URIRef("https://en.wikipedia.org/wiki/Job")
+
+# lowest similarity (1 - relative edit distance) of a misspelled
+# entity name to the name it is resolved to
+MIN_MATCH_CONFIDENCE = 0.75
+# shortest entity name matched when misspelled: one edit in a four
+# letter name scores 0.75, enough to turn Bali into Mali
+MIN_FUZZY_NAME_LENGTH = 5
+# shortest part of a person name that finds the person
+MIN_PERSON_NAME_LENGTH = 3
+
+
+def uri_name(uri):
+    """
+    :param uri: wikipedia uri of an entity
+    :return: the (unquoted) page name part of the uri
+    """
+    return unquote(str(uri).rsplit("/wiki/", 1)[-1])
+
+
+def build_country_index(graph):
+    """
+    map the normalized name of every country in the
+    ontology to its uri, using the same normalize_text
+    as parse_query, so a question finds its country with
+    one exact lookup instead of a substring scan.
+    :param graph: rdflib graph of the ontology, or an OntologyIndex
+    :return: dict normalized name -> country uri
+    """
+    country_index = {}
+    for country in sorted(graph.subjects(IS_A_URI, COUNTRY_URI)):
+        country_index.setdefault(normalize_text(uri_name(country)), country)
+    return country_index
+
+
+def name_variants(page_name):
+    """
+    other names an entity is asked by: its page name without a
+    disambiguation qualifier (Georgia for Georgia_(country)),
+    and without a leading 'the' (Gambia for The_Gambia).
+    :param page_name: page name of the entity, see uri_name
+    :return: list of normalized names, the full name first
+    """
+    names = [normalize_text(page_name)]
+    unqualified = normalize_text(re.sub(r"_\(.*\)$", "", page_name))
+    for name in (unqualified, unqualified[len('the_'):] if unqualified.startswith('the_') else None):
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def build_country_resolver(country_index):
+    """
+    :param country_index: see build_country_index
+    :return: EntityResolver of the country names and their
+    name variants; a variant never shadows the name of
+    another country
+    """
+    resolver = EntityResolver()
+    for name, country in country_index.items():
+        resolver.add(name, country)
+    for country in country_index.values():
+        for name in name_variants(uri_name(country))[1:]:
+            if name not in resolver:
+                resolver.add(name, country)
+    return resolver
+
+
+def build_person_resolver(people):
+    """
+    :param people: uris of the people of the ontology
+    :return: EntityResolver of the people names, by full name
+    and by every run of consecutive words of it (so a question
+    about 'Macron' finds Emmanuel_Macron)
+    """
+    resolver = EntityResolver()
+    for person in sorted(people):
+        for full_name in name_variants(uri_name(person)):
+            words = [w for w in full_name.split('_') if w]
+            for start in range(len(words)):
+                for end in range(start + 1, len(words) + 1):
+                    name = '_'.join(words[start:end])
+                    if len(name) >= MIN_PERSON_NAME_LENGTH:
+                        resolver.add(name, person)
+    return resolver
+
+
+class QAOntology:
+    """
+    a loaded ontology graph, together with the lookup
+    indexes question answering builds from it at load time:
+    the country and people name resolvers, and per predicate
+    adjacency maps (predicate -> subject -> objects and the
+    reverse) used to answer the built in question types
+    without SPARQL.
+    """
+
+    def __init__(self, graph, fingerprint=None):
+        self.graph = graph
+        self.fingerprint = fingerprint  # sha256 of the source ontology file
+        self.country_index = build_country_index(graph)
+
+        self.forward = {}  # predicate -> subject -> list of objects
+        self.backward = {}  # predicate -> object -> list of subjects
+        for subj, pred, obj in graph:
+            self.forward.setdefault(pred, {}).setdefault(subj, []).append(obj)
+            self.backward.setdefault(pred, {}).setdefault(obj, []).append(subj)
+
+        self.country_resolver = build_country_resolver(self.country_index)
+        # people with a job, for the 'who' question
+        self.person_resolver = build_person_resolver(self.forward.get(JOB_URI, {}))
+
+    def resolve_country(self, name):
+        """
+        :param name: normalized country name, as returned by parse_query
+        :return: country URIRef, or None if no country name is
+        close enough
+        """
+        country, confidence = self.country_resolver.resolve(name, MIN_MATCH_CONFIDENCE, MIN_FUZZY_NAME_LENGTH)
+        return country
+
+    def resolve_people(self, name):
+        """
+        :param name: normalized person name, as returned by parse_query
+        :return: list of the people best matching the name
+        """
+        people, confidence = self.person_resolver.resolve_all(name, MIN_MATCH_CONFIDENCE, MIN_FUZZY_NAME_LENGTH)
+        return people
+
+    def objects(self, subject, predicate):
+        return self.forward.get(predicate, {}).get(subject, [])
+
+    def subjects(self, predicate, obj):
+        return self.backward.get(predicate, {}).get(obj, [])
+
+
+class MappedQAOntology(QAOntology):
+    """
+    the lookups of QAOntology, read from a memory mapped
+    OntologyIndex instead of adjacency maps built by every
+    process: processes serving from the same index file share
+    its pages. uris and literals are plain strings. The graph,
+    for the SPARQL templates, is backed by an ArrayStore over
+    the same index.
+    """
+
+    def __init__(self, index, fingerprint=None):
+        self.graph = Graph(store=ArrayStore(index))
+        self.index = index
+        self.fingerprint = fingerprint
+        self.country_index = build_country_index(index)
+        self.country_resolver = build_country_resolver(self.country_index)
+        self.person_resolver = build_person_resolver(index.predicate_subjects(JOB_URI))
+
+    def objects(self, subject, predicate):
+        return self.index.objects(subject, predicate)
+
+    def subjects(self, predicate, obj):
+        return self.index.subjects(predicate, obj)
+
+
+def native_query(ontology, query_key, query_arg):
+    """
+    answer one of the question types of parse_query straight
+    from the adjacency maps, with no SPARQL parsing or evaluation.
+    :param ontology: loaded ontology, see load_ontology
+    :param query_key: question type returned by parse_query
+    :param query_arg: country or person returned by parse_query
+    :return: list of rows, shaped like the SPARQL results of the
+    matching query_formats template
+    """
+    if query_key == 'who':
+        rows = []
+        for person in ontology.resolve_people(query_arg):
+            for position in ontology.objects(person, JOB_URI):
+                for country in ontology.objects(person, position):
+                    rows.append((position, country))
+        return rows
+
+    country = ontology.resolve_country(query_arg)
+    if country is None:
+        return []
+    if query_key == 'presi':
+        return [(person,) for person in ontology.subjects(PRESIDENT_URI, country)]
+    elif query_key == 'prime':
+        return [(person,) for person in ontology.subjects(PRIME_MINISTER_URI, country)]
+    elif query_key == 'popul':
+        return [(population,) for population in ontology.objects(country, POPULATION_URI)]
+    elif query_key == 'area':
+        return [(area,) for area in ontology.objects(country, AREA_URI)]
+    elif query_key == 'capital':
+        return [(capital,) for capital in ontology.subjects(CAPITAL_URI, country)]
+    elif query_key == 'gov':
+        return [(gov_type,) for gov_type in ontology.objects(country, GOVERNMENT_URI)]
+    elif query_key in ('presi_bday', 'prime_bday'):
+        job = PRESIDENT_URI if query_key == 'presi_bday' else PRIME_MINISTER_URI
+        return [(bday,) for person in ontology.subjects(job, country)
+                for bday in ontology.objects(person, BIRTHDAY_URI)]
+    return None
+
+
+def sparql_query(ontology, query_key, query_arg):
+    """
+    answer a question type with its prepared query_formats
+    template, binding the entity found in the indexes.
+    :return: list of result rows
+    """
+    if query_key == 'who':
+        rows = []
+        for person in ontology.resolve_people(query_arg):
+            rows.extend(run_query(ontology.graph, query_key, cand=URIRef(person)))
+        return rows
+    country = ontology.resolve_country(query_arg)
+    if country is None:
+        return []
+    return run_query(ontology.graph, query_key, country=URIRef(country))
+
+
+def load_ontology(ontology_path="ontology.nt"):
+    # binary snapshot written by create when fresh, else the N-Triples
+    return QAOntology(load_graph(ontology_path), ontology_fingerprint(ontology_path))
+
+
+def load_mapped_ontology(ontology_path="ontology.nt"):
+    """
+    map the index file of an ontology (written by create, or
+    here if missing or stale) for MappedQAOntology.
+    """
+    return MappedQAOntology(open_index(ontology_path), ontology_fingerprint(ontology_path))
+
+
+def make_answer_cache(ontology, cache_path=None, max_size=DEFAULT_CACHE_SIZE):
+    """
+    create an answer cache for a loaded ontology, filled with
+    the answers saved at cache_path if they were answered from
+    the same ontology file.
+    """
+    cache = AnswerCache(ontology.fingerprint, max_size)
+    if cache_path:
+        cache.load(cache_path)
+    return cache
+
+
+def answer_parsed(ontology, query_key, query_arg, native=True, cache=None):
+    """
+    answer a question already parsed by parse_query.
+    :param ontology: loaded ontology, see load_ontology
+    :param query_key: question type returned by parse_query
+    :param query_arg: country or person returned by parse_query
+    :param native: answer from the adjacency maps (see native_query)
+    instead of the query_formats SPARQL templates
+    :param cache: optional AnswerCache, skipping the query and the
+    formatting for an already answered key
+    :return: tuple of status (ANSWERED or NO_RESULTS) and the
+    response string
+    """
+    if cache is not None:
+        cached = cache.get((query_key, query_arg))
+        if cached is not None:
+            return cached
+
+    # execute query, natively for the built in question types
+    query_res = native_query(ontology, query_key, query_arg) if native else None
+    if query_res is None:
+        query_res = sparql_query(ontology, query_key, query_arg)
+
+    # format query result as answer string
+    if query_res:
+        answer = ANSWERED, get_response_string(query_key, query_res)
+    else:
+        answer = NO_RESULTS, "no results found."
+
+    if cache is not None:
+        cache.put((query_key, query_arg), answer)
+    return answer
+
+
+def answer_question(ontology, question, native=True, cache=None):
+    """
+    answer a natural language question using the
+    parse_query -> query -> get_response_string pipeline.
+    :param ontology: loaded ontology, see load_ontology
+    :param question: natural language question
+    :param native: see answer_parsed
+    :param cache: optional AnswerCache, see answer_parsed
+    :return: tuple of status (ANSWERED, NO_RESULTS or UNRECOGNIZED)
+    and the response string
+    """
+    # parse the query
+    query_key, query_arg = parse_query(question)
+    if query_key is None:
+        return UNRECOGNIZED, "unrecognized query."
+    return answer_parsed(ontology, query_key, query_arg, native, cache)
+
+
+def answer_batch(ontology, questions, out, out_format="tsv", cache=None):
+    """
+    answer questions one per line, streaming a line per
+    answer to out as soon as it is ready.
+    tsv lines are: question <tab> status <tab> response
+    jsonl lines are: {"question": ..., "status": ..., "response": ...}
+    :param ontology: loaded ontology, see load_ontology
+    :param questions: iterable of question lines
+    :param out: writable text file
+    :param out_format: "tsv" or "jsonl"
+    :param cache: optional AnswerCache
+    :return: dict status -> number of questions
+    """
+    counts = {ANSWERED: 0, NO_RESULTS: 0, UNRECOGNIZED: 0}
+    for line in questions:
+        question = line.strip()
+        if not question:
+            continue
+        status, response = answer_question(ontology, question, cache=cache)
+        counts[status] += 1
+        if out_format == "jsonl":
+            out.write(json.dumps({'question': question, 'status': status, 'response': response}) + "\n")
+        else:
+            fields = [question, status, response]
+            out.write("\t".join(' '.join(f.split()) for f in fields) + "\n")
+        out.flush()
+    return counts
@@ -0,0 +1,151 @@
+from lxml import etree, html
+
+
+# bytes fed to the streaming parser at a time
+PARSE_CHUNK_SIZE = 16 * 1024
+
+# row level xpath expressions, compiled once instead of per country
+ROW_FIRST_TD_LINK = etree.XPath("td[1]//a[1]")
+ROW_NESTED_TD_LINK = etree.XPath(".//td[1]//a[1]")
+ROW_CAPITAL_LINK = etree.XPath(".//a[not(contains(@class, 'external')) and not(contains(@href, 'endnote'))][1]")
+ROW_FIRST_TD_TEXT = etree.XPath("td[1]/text()[1]")
+ROW_TD_TEXTS = etree.XPath("td//text()[1]")
+ROW_TD_NODES = etree.XPath("td//node()")
+
+
+def is_infobox(element):
+    return element.tag == 'table' and 'infobox' in element.get('class', '')
+
+
+def is_bday(element):
+    return element.tag == 'span' and element.get('class') == 'bday'
+
+
+def parse_first_element(content, is_target, chunk_size=PARSE_CHUNK_SIZE):
+    """
+    incrementally parse an html page, and stop as soon as the
+    first element matching is_target has been closed, instead of
+    building the tree of the whole article. Elements that close
+    before the target starts can't contain it, so they are cleared
+    on the way, keeping memory proportional to the target size.
+    :param content: page content (bytes)
+    :param is_target: callable taking an element at its start tag
+    :param chunk_size: bytes fed to the parser at a time
+    :return: lxml.html element of the target, or None if missing
+    """
+    parser = etree.HTMLPullParser(events=('start', 'end'))
+    parser.set_element_class_lookup(html.HtmlElementClassLookup())
+
+    target = None
+    for offset in range(0, len(content), chunk_size):
+        parser.feed(content[offset:offset + chunk_size])
+        for event, element in parser.read_events():
+            if event == 'start':
+                if target is None and is_target(element):
+                    target = element
+            elif element is target:
+                return target
+            elif target is None:
+                element.clear()
+    parser.close()
+    return target
+
+
+def _first_text(element):
+    """
+    first text node child of an element, like text() in
+    xpath: the element text, or else the first child tail.
+    """
+    if element.text is not None:
+        return element.text
+    for child in element:
+        if child.tail is not None:
+            return child.tail
+    return None
+
+
+def _texts(element):
+    """
+    all text node children of an element, like text() in xpath:
+    the element text and the tails of its children.
+    """
+    if element.text is not None:
+        yield element.text
+    for child in element:
+        if child.tail is not None:
+            yield child.tail
+
+
+def _is_descendant(element, ancestor):
+    parent = element.getparent()
+    while parent is not None:
+        if parent is ancestor:
+            return True
+        parent = parent.getparent()
+    return False
+
+
+def _classify_row(row, labels):
+    """
+    find the labels a single infobox row carries.
+    :param row: lxml element of a tr
+    :param labels: set, updated with the labels of the row
+    """
+    for element in row.iterdescendants():
+        if not isinstance(element.tag, str):  # skip comments
+            continue
+        text = _first_text(element)
+        if text is None:
+            continue
+        if 'Population' in text:
+            labels.add('population')
+        if 'Prime Minister' in text:
+            labels.add('prime_minister')
+        # text()='President' holds if any text child is the label, as
+        # in "• <a>Head of state</a><br/>President"; contains(text(), ...)
+        # above and below only reads the first one
+        if any(t.strip() == 'President' for t in _texts(element)):
+            labels.add('president')
+        if 'Government' in text and element.tag in ('a', 'th'):
+            labels.add('government')
+
+    headers = row.findall('th')
+    if any('Capital' in (_first_text(th) or '') for th in headers):
+        labels.add('capital')
+    if headers and 'Total' in next(headers[0].itertext(), ''):
+        labels.add('total')
+
+
+def index_infobox_rows(infobox):
+    """
+    walk the rows of an infobox once and index them by
+    the field they hold, so field extractors don't need
+    to scan the whole infobox again:
+        'population'       - first row labeled Population
+        'population_value' - the row following it (holds the estimate)
+        'prime_minister'   - first row mentioning Prime Minister
+        'president'        - first row with a President label
+        'capital'          - first row with a Capital header
+        'total'            - first row with a Total header (area)
+        'government'       - list of all rows mentioning Government
+    :param infobox: lxml html element of infobox
+    :return: dict label -> row element (list of rows for government)
+    """
+    rows = {'government': []}
+    population_row = None
+    for row in infobox.iter('tr'):
+        # the row following the population label holds the estimate
+        if population_row is not None and 'population_value' not in rows:
+            if not _is_descendant(row, population_row):
+                rows['population_value'] = row
+
+        labels = set()
+        _classify_row(row, labels)
+        for label in labels:
+            if label == 'government':
+                rows['government'].append(row)
+            elif label not in rows:
+                rows[label] = row
+        if 'population' in labels and population_row is None:
+            population_row = row
+    return rows
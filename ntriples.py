@@ -0,0 +1,215 @@
+import re
+from urllib.parse import unquote
+
+WIKIPEDIA_BASE_URL = "https://en.wikipedia.org"
+XSD_DATE = "http://www.w3.org/2001/XMLSchema#date"
+XSD_INTEGER = "http://www.w3.org/2001/XMLSchema#integer"
+XSD_POSITIVE_INTEGER = "http://www.w3.org/2001/XMLSchema#positiveInteger"
+
+# write buffer of the output file
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def uri(link):
+    """
+    :param link: full uri
+    :return: N-Triples term of the uri
+    """
+    return '<' + link + '>'
+
+
+def literal(value, datatype):
+    """
+    :param value: literal value, converted with str
+    :param datatype: full uri of the xsd datatype
+    :return: N-Triples term of the typed literal
+    """
+    lexical = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+    return '"' + lexical + '"^^<' + datatype + '>'
+
+
+# ontology vocabulary, encoded once and reused for every triple
+COUNTRY = uri('https://en.wikipedia.org/wiki/Country')
+PERSON = uri('https://en.wikipedia.org/wiki/Person')
+JOB = uri('https://en.wikipedia.org/wiki/Job')
+CITY = uri("https://en.wikipedia.org/wiki/City")
+PRESIDENT = uri("https://en.wikipedia.org/wiki/President")
+PRIME_MINISTER = uri("https://en.wikipedia.org/wiki/Prime_minister")
+CAPITAL = uri("https://en.wikipedia.org/wiki/Capital_city")
+POPULATION = uri("https://en.wikipedia.org/wiki/Population")
+AREA = uri("https://en.wikipedia.org/wiki/Area")
+IS_A = uri("https://en.wikipedia.org/wiki/Is-a")
+GOVERNMENT_TYPE = uri("https://en.wikipedia.org/wiki/Government")
+TYPE_TO_COUNTRY = uri("http://example.org/government_to_country")
+BIRTHDAY = uri("https://en.wikipedia.org/wiki/Birthday")
+GOVERNMENT_CATEGORY = uri("http://example.org/government_category")
+COUNTRY_COUNT = uri("http://example.org/country_count")
+
+# categories of government types: category -> the words of a
+# government type page name (split at '_', lower case) that put the
+# page in the category, as the republic and monarchy counts once
+# matched any page with the word in it. Hyphenated words stay whole,
+# so semi-presidential is not presidential, nor dominant-party
+# one-party. Countries are classified once, when the ontology is
+# built, and the count of each category is written with it.
+GOVERNMENT_CATEGORIES = {
+    'republic': ('republic',),
+    'monarchy': ('monarchy',),
+    'federal': ('federal', 'federation', 'federalism'),
+    'unitary': ('unitary',),
+    'parliamentary': ('parliamentary',),
+    'presidential': ('presidential',),
+    'semi_presidential': ('semi-presidential',),
+    'one_party': ('one-party',),
+    'dominant_party': ('dominant-party',)}
+
+# pages whose category none of their words tells: page name -> categories
+GOVERNMENT_CATEGORY_PAGES = {
+    'socialist_state': ('one_party',)}
+
+# word -> categories, for one lookup per word of a government type
+_WORD_CATEGORIES = {}
+for _category, _words in GOVERNMENT_CATEGORIES.items():
+    for _word in _words:
+        _WORD_CATEGORIES.setdefault(_word, []).append(_category)
+
+
+def government_category_link(category):
+    """
+    :param category: key of GOVERNMENT_CATEGORIES
+    :return: full uri of the category
+    """
+    return "http://example.org/government_category/" + category
+
+
+def government_page_name(government_link):
+    """
+    :param government_link: wiki link of a government type page
+    :return: lower case page name of the link
+    """
+    # the section of a page (#...) is the same government type
+    return unquote(government_link.rsplit('/', 1)[-1].split('#', 1)[0]).lower()
+
+
+def government_categories(government_link):
+    """
+    :param government_link: wiki link of a government type page
+    :return: list of the GOVERNMENT_CATEGORIES the type belongs to
+    """
+    page_name = government_page_name(government_link)
+    categories = list(GOVERNMENT_CATEGORY_PAGES.get(page_name, ()))
+    for word in re.split(r'[_()]+', page_name):
+        for category in _WORD_CATEGORIES.get(word, ()):
+            if category not in categories:
+                categories.append(category)
+    return categories
+
+
+class NTriplesWriter:
+    """
+    write triples of already encoded N-Triples terms straight
+    to a buffered file, as they are produced, without building
+    a graph in memory. Duplicates are dropped using a set of
+    line hashes rather than of the lines themselves.
+    """
+
+    def __init__(self, out_path, buffer_size=WRITE_BUFFER_SIZE):
+        self.out = open(out_path, 'w', encoding='utf-8', buffering=buffer_size)
+        self.seen = set()
+        self.count = 0
+
+    def add(self, subject, predicate, obj):
+        line = subject + ' ' + predicate + ' ' + obj + ' .\n'
+        key = hash(line)
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        self.out.write(line)
+        self.count += 1
+
+    def close(self):
+        self.out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def country_triples(country_info):
+    """
+    generate the triples of the ontology, as encoded N-Triples terms:
+        <person> <president_of> <country>
+        <person> <prime_minister_of> <country>
+        <country> <population> <number>
+        <country> <area> <number>
+        <government_type> <is_government_type_of> <country>
+        <country> <has_government_type> <government_type>
+        <country> <government_category> <category>
+        <category> <country_count> <number>
+        <city> <capital_of> <country>
+        <person> <birthday> <date>
+        <name> <is_a> <country>
+        <name> <is_a> <city>
+        <name> <is_a> <person>
+        <person> <job> <president / prime_minister>
+    :param country_info: dict country name -> info dict, or an
+    iterable of (country, info) pairs
+    :return: generator of (subject, predicate, object) tuples
+    """
+    country_items = country_info.items() if isinstance(country_info, dict) else country_info
+    category_countries = {category: set() for category in GOVERNMENT_CATEGORIES}
+    for country_name, cdata in country_items:
+        clink = uri(cdata['country_link'])
+        # add to is_a country relation
+        yield clink, IS_A, COUNTRY
+
+        # add capital city to ontology relations
+        if cdata['capital_city_link']:
+            capital_link = uri(WIKIPEDIA_BASE_URL + cdata['capital_city_link'])
+            yield capital_link, IS_A, CITY  # add to is_a city
+            yield capital_link, CAPITAL, clink
+
+        # add the prime minister
+        if cdata['prime_minister_link']:
+            pmlink = uri(WIKIPEDIA_BASE_URL + cdata['prime_minister_link'])
+            yield pmlink, IS_A, PERSON  # make person
+            yield pmlink, PRIME_MINISTER, clink  # make prime
+            yield pmlink, JOB, PRIME_MINISTER
+            # add birthday
+            if cdata.get('prime_minister_bday'):
+                yield pmlink, BIRTHDAY, literal(cdata['prime_minister_bday'], XSD_DATE)
+
+        # add the president
+        if cdata['president_link']:
+            prlink = uri(WIKIPEDIA_BASE_URL + cdata['president_link'])
+            yield prlink, IS_A, PERSON
+            yield prlink, PRESIDENT, clink
+            yield prlink, JOB, PRESIDENT
+            # add birthday
+            if cdata.get('president_bday'):
+                yield prlink, BIRTHDAY, literal(cdata['president_bday'], XSD_DATE)
+
+        # add the population
+        if cdata['population']:
+            yield clink, POPULATION, literal(cdata['population'], XSD_POSITIVE_INTEGER)
+
+        # add the area
+        if cdata['area']:
+            yield clink, AREA, literal(cdata['area'], XSD_POSITIVE_INTEGER)
+
+        # add government types
+        if cdata['government_types']:
+            for gt in cdata['government_types'].values():
+                glink = uri(WIKIPEDIA_BASE_URL + gt)
+                yield clink, GOVERNMENT_TYPE, glink  # country to type
+                yield glink, TYPE_TO_COUNTRY, clink  # type to country
+                for category in government_categories(gt):
+                    if clink not in category_countries[category]:
+                        category_countries[category].add(clink)
+                        yield clink, GOVERNMENT_CATEGORY, uri(government_category_link(category))
+
+    # precomputed size of every category, so counting its countries is one lookup
+    for category, countries in category_countries.items():
+        yield uri(government_category_link(category)), COUNTRY_COUNT, literal(len(countries), XSD_INTEGER)
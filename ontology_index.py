@@ -0,0 +1,302 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from answer_cache import ontology_fingerprint
+
+
+# index file layout (little endian, sections 8 byte aligned):
+#   header: magic, format version, sha256 of the source .nt,
+#           number of terms, number of triples
+#   term offsets: uint32 * (terms + 1), into the term blob
+#   term blob: utf-8 encoded terms, sorted, so a term id is the
+#              rank of its encoding (see encode_term)
+#   spo, pos, osp: uint32 term ids, 3 per triple, each sorted by
+#              its own order of subject / predicate / object
+# the file is mapped read-only, so every process serving from
+# it shares the same pages of the os page cache.
+INDEX_MAGIC = b'GEOQAIDX'
+INDEX_VERSION = 1
+_HEADER = struct.Struct('<8sI32sII')
+
+# the orders of the sorted triple arrays, as positions in (s, p, o)
+ORDERS = {'spo': (0, 1, 2), 'pos': (1, 2, 0), 'osp': (2, 0, 1)}
+
+# separates the lexical form of a literal from its datatype / language
+LITERAL_SEPARATOR = '\x1f'
+
+
+def index_path_for(nt_path):
+    return nt_path + '.idx'
+
+
+def encode_term(term):
+    """
+    :param term: rdflib term
+    :return: string key of the term in the index: a kind letter
+    (U uri, L literal, B blank node) followed by its value
+    """
+    kind = type(term).__name__
+    if kind == 'Literal':
+        extra = '@' + term.language if term.language else (str(term.datatype) if term.datatype else '')
+        return 'L' + str(term) + LITERAL_SEPARATOR + extra
+    if kind == 'BNode':
+        return 'B' + str(term)
+    return 'U' + str(term)
+
+
+def uri_key(uri):
+    return 'U' + str(uri)
+
+
+def _aligned(position):
+    return position + (-position % 8)
+
+
+def _align(out):
+    out.write(b'\0' * (-out.tell() % 8))
+
+
+def write_index(nt_path, index_path=None):
+    """
+    write the memory mappable index of an N-Triples file.
+    :param nt_path: path of the source N-Triples file
+    :param index_path: output path, defaults to <nt_path>.idx
+    :return: number of triples in the index
+    """
+    from snapshot import load_graph
+    index_path = index_path or index_path_for(nt_path)
+    graph = load_graph(nt_path)
+
+    keys = sorted({encode_term(term) for triple in graph for term in triple},
+                  key=lambda k: k.encode('utf-8'))
+    term_ids = {key: i for i, key in enumerate(keys)}
+    triples = [tuple(term_ids[encode_term(term)] for term in triple) for triple in graph]
+
+    blob = bytearray()
+    offsets = array('I', [0])
+    for key in keys:
+        blob += key.encode('utf-8')
+        offsets.append(len(blob))
+
+    sections = [offsets]
+    for order in ORDERS.values():
+        ids = array('I')
+        for triple in sorted(tuple(t[i] for i in order) for t in triples):
+            ids.extend(triple)
+        sections.append(ids)
+    if sys.byteorder != 'little':
+        for section in sections:
+            section.byteswap()
+
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, bytes.fromhex(ontology_fingerprint(nt_path)),
+                               len(keys), len(triples)))
+        _align(out)
+        out.write(sections[0].tobytes())
+        _align(out)
+        out.write(blob)
+        for section in sections[1:]:
+            _align(out)
+            out.write(section.tobytes())
+    os.replace(tmp_path, index_path)
+    return len(triples)
+
+
+def _uint32s(buffer, start, count):
+    view = memoryview(buffer)[start:start + 4 * count]
+    if sys.byteorder == 'little':
+        return view.cast('I')  # zero copy
+    ids = array('I', view)
+    ids.byteswap()
+    return ids
+
+
+class OntologyIndex:
+    """
+    read-only view of an index file written by write_index. Terms
+    are found by binary search in the sorted term blob, triples by
+    binary search in the sorted id arrays; nothing is loaded into
+    memory, all lookups read the mapped file.
+    """
+
+    def __init__(self, index_path):
+        with open(index_path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self.source_hash, self.n_terms, self.n_triples = _HEADER.unpack_from(self.map)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                raise ValueError("not an ontology index: " + index_path)
+            # section positions, checked against the file size before
+            # any of them is read, so a truncated file is not mapped
+            offsets_start = _aligned(_HEADER.size)
+            self.blob_start = _aligned(offsets_start + 4 * (self.n_terms + 1))
+            if len(self.map) < self.blob_start:
+                raise ValueError("truncated ontology index: " + index_path)
+            blob_size, = struct.unpack_from('<I', self.map, offsets_start + 4 * self.n_terms)
+            position = self.blob_start + blob_size
+            starts = {}
+            for name in ORDERS:
+                starts[name] = _aligned(position)
+                position = starts[name] + 12 * self.n_triples
+            if position != len(self.map):
+                raise ValueError("truncated or corrupt ontology index: " + index_path)
+        except (ValueError, struct.error):
+            self.map.close()
+            raise
+
+        self.offsets = _uint32s(self.map, offsets_start, self.n_terms + 1)
+        self.triples = {name: _uint32s(self.map, start, 3 * self.n_triples) for name, start in starts.items()}
+
+    def key(self, term_id):
+        start = self.blob_start + self.offsets[term_id]
+        end = self.blob_start + self.offsets[term_id + 1]
+        return self.map[start:end].decode('utf-8')
+
+    def value(self, term_id):
+        """
+        :return: the uri, or the lexical form of the literal,
+        of a term id, as a plain string
+        """
+        return self.key(term_id)[1:].split(LITERAL_SEPARATOR, 1)[0]
+
+    def term_id(self, key):
+        """
+        :param key: term key, see encode_term / uri_key
+        :return: id of the term, or None if not in the index
+        """
+        target = key.encode('utf-8')
+        low, high = 0, self.n_terms
+        while low < high:
+            middle = (low + high) // 2
+            start = self.blob_start + self.offsets[middle]
+            if self.map[start:self.blob_start + self.offsets[middle + 1]] < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.n_terms and self.key(low) == key:
+            return low
+        return None
+
+    def _lower_bound(self, ids, prefix, low=0):
+        # first row of ids, from low on, whose leading ids are >= prefix;
+        # compared id by id, without slicing a tuple out of every row
+        high = self.n_triples
+        width = len(prefix)
+        first = prefix[0]
+        second = prefix[1] if width > 1 else 0
+        third = prefix[2] if width > 2 else 0
+        while low < high:
+            middle = (low + high) // 2
+            row = 3 * middle
+            a = ids[row]
+            if a == first and width > 1:
+                b = ids[row + 1]
+                if b == second and width > 2:
+                    before = ids[row + 2] < third
+                else:
+                    before = b < second
+            else:
+                before = a < first
+            if before:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def rows(self, order, prefix):
+        """
+        :param order: name of the triple order, a key of ORDERS
+        :param prefix: tuple of 0 to 3 leading term ids in that order
+        :return: generator of the matching (a, b, c) id rows, in
+        the given order
+        """
+        ids = self.triples[order]
+        if not prefix:
+            start, end = 0, self.n_triples
+        else:
+            start = self._lower_bound(ids, prefix)
+            end = self._lower_bound(ids, prefix[:-1] + (prefix[-1] + 1,), start)
+        for row in range(3 * start, 3 * end, 3):
+            yield ids[row], ids[row + 1], ids[row + 2]
+
+    def contains(self, ids):
+        """
+        :param ids: (s, p, o) tuple of term ids
+        :return: whether the index holds the triple
+        """
+        spo = self.triples['spo']
+        row = 3 * self._lower_bound(spo, ids)
+        return row < 3 * self.n_triples and spo[row] == ids[0] and spo[row + 1] == ids[1] and spo[row + 2] == ids[2]
+
+    def objects(self, subject, predicate):
+        """
+        :param subject: uri
+        :param predicate: uri
+        :return: list of the object values, see value
+        """
+        s, p = self.term_id(uri_key(subject)), self.term_id(uri_key(predicate))
+        if s is None or p is None:
+            return []
+        return [self.value(o) for _, _, o in self.rows('spo', (s, p))]
+
+    def subjects(self, predicate, obj):
+        """
+        :param predicate: uri
+        :param obj: uri
+        :return: list of the subject uris
+        """
+        p, o = self.term_id(uri_key(predicate)), self.term_id(uri_key(obj))
+        if p is None or o is None:
+            return []
+        return [self.value(s) for _, _, s in self.rows('pos', (p, o))]
+
+    def predicate_subjects(self, predicate):
+        """
+        :return: list of the distinct subject uris of a predicate
+        """
+        p = self.term_id(uri_key(predicate))
+        if p is None:
+            return []
+        return [self.value(s) for s in sorted({s for _, _, s in self.rows('pos', (p,))})]
+
+    def close(self):
+        for ids in [self.offsets] + list(self.triples.values()):
+            if isinstance(ids, memoryview):
+                ids.release()
+        self.map.close()
+
+
+def load_index(nt_path, index_path=None):
+    """
+    :param nt_path: path of the source N-Triples file
+    :param index_path: index path, defaults to <nt_path>.idx
+    :return: OntologyIndex, or None if the index is missing, of
+    another version, truncated or stale (the .nt changed since)
+    """
+    index_path = index_path or index_path_for(nt_path)
+    if not os.path.isfile(index_path):
+        return None
+    try:
+        index = OntologyIndex(index_path)
+    except (ValueError, struct.error):
+        return None
+    if index.source_hash.hex() != ontology_fingerprint(nt_path):
+        index.close()
+        return None
+    return index
+
+
+def open_index(nt_path):
+    """
+    :param nt_path: path of the source N-Triples file
+    :return: OntologyIndex of nt_path, (re)writing the index
+    first if it is missing, truncated or stale
+    """
+    index = load_index(nt_path)
+    if index is None:
+        write_index(nt_path)
+        index = OntologyIndex(index_path_for(nt_path))
+    return index
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from qa_server import DEFAULT_SOCKET_PATH, UNRECOGNIZED, TIMEOUT, ERROR, encode_reply, claim_socket
+
+
+# questions answered concurrently, questions accepted but not yet
+# answered (over all connections), and seconds a question may take
+DEFAULT_SERVE_WORKERS = 4
+DEFAULT_MAX_PENDING = 64
+DEFAULT_REQUEST_TIMEOUT = 10.0
+# longest question line accepted
+MAX_LINE_LENGTH = 64 * 1024
+
+
+def _release_when_done(slots):
+    def release(future):
+        slots.release()
+        if not future.cancelled():
+            future.exception()  # retrieved, for answers that timed out
+    return release
+
+
+class _QuestionServer:
+    """
+    line protocol: the client writes one question per line,
+    the server answers each with one json line holding the
+    status and the response string, in the order asked.
+    questions are parsed on the event loop; parsed questions
+    are answered on a bounded thread pool, so one slow answer
+    holds a worker, not the loop or the other connections.
+    """
+
+    def __init__(self, parse, answer, workers, max_pending, timeout):
+        self.parse = parse
+        self.answer = answer
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='answer')
+        # backpressure: with max_pending questions in flight, the
+        # connections stop being read until one is answered
+        self.slots = asyncio.Semaphore(max_pending)
+
+    async def answer_line(self, question):
+        parsed = self.parse(question)
+        if parsed is None:
+            return UNRECOGNIZED, "unrecognized query."
+
+        await self.slots.acquire()
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self.answer, parsed)
+        # the slot is held until the answer is done, even after a
+        # timeout: a stuck answer still occupies its worker
+        future.add_done_callback(_release_when_done(self.slots))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            return TIMEOUT, "timed out after {:g} seconds.".format(self.timeout)
+        except Exception as e:
+            return ERROR, str(e)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(encode_reply(ERROR, "question longer than {} bytes.".format(MAX_LINE_LENGTH)))
+                    break
+                if not line:
+                    break
+                question = line.decode('utf-8', errors='replace').strip()
+                if not question:
+                    continue
+                status, response = await self.answer_line(question)
+                writer.write(encode_reply(status, response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def _serve(server, socket_path):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    listener = await asyncio.start_unix_server(server.handle, path=socket_path, limit=MAX_LINE_LENGTH)
+    print("serving questions on", socket_path)
+    async with listener:
+        await stop.wait()
+
+
+def serve(parse, answer, socket_path=DEFAULT_SOCKET_PATH, workers=DEFAULT_SERVE_WORKERS,
+          max_pending=DEFAULT_MAX_PENDING, timeout=DEFAULT_REQUEST_TIMEOUT):
+    """
+    answer questions from many concurrent clients over a unix
+    socket, until SIGTERM or SIGINT.
+    :param parse: callable question -> parsed question, or None
+    for an unrecognized question; runs on the event loop, so it
+    must be fast
+    :param answer: callable parsed question -> (status, response
+    string); runs on the worker threads, so it must only read
+    shared state
+    :param socket_path: path of the unix socket to listen on
+    :param workers: number of questions answered concurrently
+    :param max_pending: number of questions accepted and not
+    yet answered before connections stop being read
+    :param timeout: seconds after which a question is replied
+    to with the TIMEOUT status
+    :raise DaemonRunningError: if a server already answers on socket_path
+    """
+    claim_socket(socket_path)
+    server = _QuestionServer(parse, answer, workers, max_pending, timeout)
+    try:
+        asyncio.run(_serve(server, socket_path))
+    finally:
+        server.executor.shutdown(wait=False)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,112 @@
+import os
+import signal
+import socket
+from qa_server import DEFAULT_SOCKET_PATH, ERROR, encode_reply, claim_socket
+
+
+# worker processes of the pool, one per core by default
+DEFAULT_PROCESSES = os.cpu_count() or 1
+# longest question line accepted
+MAX_LINE_LENGTH = 64 * 1024
+# connections waiting for a free worker before clients are refused
+LISTEN_BACKLOG = 128
+
+
+def _handle_connection(conn, answer):
+    stream = conn.makefile('rwb')
+    while True:
+        line = stream.readline(MAX_LINE_LENGTH + 1)
+        if not line:
+            return
+        if len(line) > MAX_LINE_LENGTH:
+            stream.write(encode_reply(ERROR, "question longer than {} bytes.".format(MAX_LINE_LENGTH)))
+            stream.flush()
+            return
+        question = line.decode('utf-8', errors='replace').strip()
+        if not question:
+            continue
+        try:
+            status, response = answer(question)
+        except Exception as e:
+            status, response = ERROR, str(e)
+        stream.write(encode_reply(status, response))
+        stream.flush()
+
+
+def _worker(listener, answer):
+    # the parent stops the pool; ctrl-c in the terminal is for it only
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    while True:
+        conn, _ = listener.accept()
+        with conn:
+            try:
+                _handle_connection(conn, answer)
+            except OSError:
+                pass
+
+
+def _exit_on_signal(signum, frame):
+    raise SystemExit(0)
+
+
+def serve_prefork(answer, socket_path=DEFAULT_SOCKET_PATH, processes=DEFAULT_PROCESSES):
+    """
+    answer questions over a unix socket with a pool of forked
+    worker processes, until SIGTERM or SIGINT. Each worker
+    accepts connections from the shared listening socket and
+    answers one connection at a time; a worker that dies is
+    replaced. Whatever answer reads was set up before the fork,
+    so the workers share it (e.g. a memory mapped index) with
+    the parent instead of each holding a copy.
+    :param answer: callable question -> (status, response string)
+    :param socket_path: path of the unix socket to listen on
+    :param processes: number of worker processes
+    :raise DaemonRunningError: if a server already answers on socket_path
+    """
+    claim_socket(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(LISTEN_BACKLOG)
+
+    workers = set()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _worker(listener, answer)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        workers.add(pid)
+
+    signal.signal(signal.SIGTERM, _exit_on_signal)
+    try:
+        for _ in range(processes):
+            spawn()
+        print("serving questions on {} with {} worker processes".format(socket_path, processes))
+        while True:
+            pid, status = os.wait()
+            if pid in workers:
+                workers.discard(pid)
+                print("worker {} exited with status {}, restarting it".format(pid, status))
+                spawn()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in workers:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        listener.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
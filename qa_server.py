@@ -0,0 +1,79 @@
+import json
+import os
+import socket
+
+
+# unix socket the question answering daemon listens on
+DEFAULT_SOCKET_PATH = "geo_qa.sock"
+
+# answer statuses
+ANSWERED = "answered"
+NO_RESULTS = "no_results"
+UNRECOGNIZED = "unrecognized"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+
+class DaemonRunningError(Exception):
+    """
+    a server already answers on the socket path serve was given
+    """
+
+
+def daemon_running(socket_path):
+    """
+    :param socket_path: path of a daemon unix socket
+    :return: whether a server accepts connections on it
+    """
+    if not os.path.exists(socket_path):
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+    except OSError:
+        return False
+    return True
+
+
+def claim_socket(socket_path):
+    """
+    remove the socket file a server that is gone left behind,
+    so a new one can listen on the path.
+    :param socket_path: path of the daemon unix socket
+    :raise DaemonRunningError: if a server still answers on it
+    """
+    if daemon_running(socket_path):
+        raise DaemonRunningError("a question daemon is already running on " + socket_path)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+
+def encode_reply(status, response):
+    """
+    :return: the json line the daemon answers a question with
+    """
+    return json.dumps({'status': status, 'response': response}).encode('utf-8') + b'\n'
+
+
+def ask(question, socket_path=DEFAULT_SOCKET_PATH, timeout=30):
+    """
+    send a question to a running daemon.
+    :param question: natural language question
+    :param socket_path: path of the daemon unix socket
+    :return: tuple of status and response string, or None
+    if no daemon is listening on socket_path
+    """
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(question.replace('\n', ' ').encode('utf-8') + b'\n')
+            reply = sock.makefile('rb').readline()
+    except OSError:
+        return None
+    if not reply:
+        return None
+    reply = json.loads(reply.decode('utf-8'))
+    return reply['status'], reply['response']
@@ -0,0 +1,51 @@
+# registered query texts, and their prepared (parsed + translated) plans
+_query_texts = {}
+_prepared_queries = {}
+
+
+def register_query(name, query_text):
+    """
+    register a SPARQL query under a name. The query is
+    prepared once, on first use or by prepare_all, and the
+    plan is reused by every following run_query.
+    parameters are passed as bindings, never formatted into
+    the query text.
+    :param name: unique name of the query
+    :param query_text: SPARQL query text
+    """
+    if _query_texts.get(name, query_text) != query_text:
+        raise ValueError("query already registered with another text: " + name)
+    _query_texts[name] = query_text
+
+
+def get_prepared(name):
+    """
+    :param name: name of a registered query
+    :return: the prepared query plan
+    """
+    prepared = _prepared_queries.get(name)
+    if prepared is None:
+        # the sparql engine is only imported by processes that run queries
+        from rdflib.plugins.sparql import prepareQuery
+        prepared = _prepared_queries[name] = prepareQuery(_query_texts[name])
+    return prepared
+
+
+def prepare_all():
+    """
+    prepare every registered query up front, for long running
+    processes that should not pay the cost on a first request.
+    """
+    for name in _query_texts:
+        get_prepared(name)
+
+
+def run_query(graph, name, **bindings):
+    """
+    run a registered query with its prepared plan.
+    :param graph: rdflib graph to query
+    :param name: name of a registered query
+    :param bindings: variable name -> rdflib term
+    :return: list of result rows
+    """
+    return list(graph.query(get_prepared(name), initBindings=bindings))
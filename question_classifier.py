@@ -0,0 +1,114 @@
+import re
+import unicodedata
+
+
+# question templates: leading words -> (question type, required last word)
+# the entity is every word between the leading words and the last word
+QUESTION_PREFIXES = {
+    ('Who', 'is', 'the', 'president', 'of'): ('presi', None),
+    ('Who', 'is', 'the', 'prime', 'minister', 'of'): ('prime', None),
+    ('What', 'is', 'the', 'population', 'of'): ('popul', None),
+    ('What', 'is', 'the', 'area', 'of'): ('area', None),
+    ('What', 'is', 'the', 'government', 'of'): ('gov', None),
+    ('What', 'is', 'the', 'capital', 'of'): ('capital', None),
+    ('When', 'was', 'the', 'president', 'of'): ('presi_bday', 'born'),
+    ('When', 'was', 'the', 'prime', 'minister', 'of'): ('prime_bday', 'born'),
+}
+PREFIX_LENGTHS = sorted({len(prefix) for prefix in QUESTION_PREFIXES}, reverse=True)
+
+# who is <person>: one or two words
+WHO_PREFIX = ('Who', 'is')
+WHO_MAX_WORDS = 2
+
+# a single word of the entity; applied per token, so it can
+# only scan the token once
+_WORD = re.compile(r"\w+")
+
+
+def _tokenize(question):
+    """
+    split a question into words, dropping the question marks
+    that end it.
+    :param question: natural language question
+    :return: list of words, or None if the question does not
+    end with a question mark
+    """
+    body = question.rstrip()
+    stripped = body.rstrip('?')
+    if len(stripped) == len(body):
+        return None
+    return stripped.split()
+
+
+def _entity(words):
+    for word in words:
+        if not _WORD.fullmatch(word):
+            return None
+    return ' '.join(words)
+
+
+def classify_question(question):
+    """
+    find the question type and the entity of a question in a
+    single pass over its words: the leading words select the
+    template with one dict lookup, and the remaining words are
+    checked once each. runs in time linear in the length of
+    the question, whatever the input.
+    :param question: natural language question
+    :return: tuple of question type and entity words joined by
+    spaces, or (None, None) if the question matches no template
+    """
+    words = _tokenize(question)
+    if not words:
+        return None, None
+
+    for prefix_len in PREFIX_LENGTHS:
+        template = QUESTION_PREFIXES.get(tuple(words[:prefix_len]))
+        if template is None:
+            continue
+        query_key, last_word = template
+        entity_words = words[prefix_len:]
+        if last_word is not None:
+            if not entity_words or entity_words[-1] != last_word:
+                return None, None
+            entity_words = entity_words[:-1]
+        if not entity_words:
+            return None, None
+        entity = _entity(entity_words)
+        return (query_key, entity) if entity else (None, None)
+
+    # who is <person>
+    if tuple(words[:len(WHO_PREFIX)]) == WHO_PREFIX and \
+            1 <= len(words) - len(WHO_PREFIX) <= WHO_MAX_WORDS:
+        entity = _entity(words[len(WHO_PREFIX):])
+        if entity:
+            return 'who', entity
+    return None, None
+
+
+def strip_accents(s):
+   return ''.join(c for c in unicodedata.normalize('NFD', s)
+                  if unicodedata.category(c) != 'Mn')
+
+
+def normalize_text(text):
+    """
+    strip, replace spaces with underscores, convert to lower case
+    :param text: any string
+    :return: normalized text
+    """
+    striped = strip_accents('_'.join(re.split("\s+", text.strip().lower().replace("-", "_"))))
+
+    return ''.join([c for c in striped if (c.isalpha() or c == "_")])
+
+
+def parse_query(query):
+    """
+    :param query: natural language question
+    :return: tuple of question type and normalized country or
+    person, or (None, None) for an unrecognized question
+    """
+    query_key, entity = classify_question(query)
+    if query_key is None:
+        return None, None
+    return query_key, normalize_text(entity)
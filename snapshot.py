@@ -0,0 +1,145 @@
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+import rdflib
+from rdflib import URIRef, Literal, BNode
+from answer_cache import ontology_fingerprint
+
+
+# snapshot file layout (little endian):
+#   header: magic, format version, sha256 of the source .nt,
+#           byte length of the term table, number of triples
+#   term table: utf-8 json list of [kind, value, datatype / lang]
+#   triples: uint32 term ids, subject predicate object per triple
+#   trailer: crc32 of the term table and triples
+SNAPSHOT_MAGIC = b'GEOQASNP'
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct('<8sI32sII')
+_TRAILER = struct.Struct('<I')
+
+
+def snapshot_path_for(nt_path):
+    return nt_path + '.snap'
+
+
+def _encode_term(term):
+    if isinstance(term, Literal):
+        if term.language:
+            return ['L', str(term), '@' + term.language]
+        return ['L', str(term), str(term.datatype) if term.datatype else '']
+    if isinstance(term, BNode):
+        return ['B', str(term), '']
+    return ['U', str(term), '']
+
+
+def _decode_term(kind, value, extra):
+    if kind == 'U':
+        return URIRef(value)
+    if kind == 'L':
+        if extra.startswith('@'):
+            return Literal(value, lang=extra[1:])
+        return Literal(value, datatype=URIRef(extra) if extra else None)
+    return BNode(value)
+
+
+def write_snapshot(nt_path, snapshot_path=None):
+    """
+    write a dictionary encoded binary snapshot of an
+    N-Triples file: every distinct term is stored once in a
+    term table, and triples as arrays of integer term ids.
+    :param nt_path: path of the source N-Triples file
+    :param snapshot_path: output path, defaults to <nt_path>.snap
+    :return: number of triples in the snapshot
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(nt_path)
+    graph = rdflib.Graph()
+    graph.parse(nt_path, format='nt')
+
+    term_ids = {}
+    terms = []
+    triple_ids = array('I')
+    for triple in graph:
+        for term in triple:
+            term_id = term_ids.get(term)
+            if term_id is None:
+                term_id = term_ids[term] = len(terms)
+                terms.append(_encode_term(term))
+            triple_ids.append(term_id)
+
+    term_table = json.dumps(terms).encode('utf-8')
+    if sys.byteorder != 'little':
+        triple_ids.byteswap()
+    triple_bytes = triple_ids.tobytes()
+
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, bytes.fromhex(ontology_fingerprint(nt_path)),
+                          len(term_table), len(graph))
+    crc = zlib.crc32(triple_bytes, zlib.crc32(term_table))
+    tmp_path = snapshot_path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(header)
+        out.write(term_table)
+        out.write(triple_bytes)
+        out.write(_TRAILER.pack(crc))
+    os.replace(tmp_path, snapshot_path)
+    return len(graph)
+
+
+def load_snapshot(nt_path, snapshot_path=None):
+    """
+    load the graph from the binary snapshot of nt_path.
+    :param nt_path: path of the source N-Triples file
+    :param snapshot_path: snapshot path, defaults to <nt_path>.snap
+    :return: rdflib graph, or None if the snapshot is missing,
+    corrupt, of another version or stale (the .nt changed since)
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(nt_path)
+    if not os.path.isfile(snapshot_path):
+        return None
+    with open(snapshot_path, 'rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size + _TRAILER.size:
+        return None
+
+    magic, version, source_hash, table_len, n_triples = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        return None
+    if source_hash != bytes.fromhex(ontology_fingerprint(nt_path)):
+        return None
+
+    table_end = _HEADER.size + table_len
+    triples_end = table_end + 12 * n_triples
+    if len(data) != triples_end + _TRAILER.size:
+        return None
+    term_table = data[_HEADER.size:table_end]
+    triple_bytes = data[table_end:triples_end]
+    crc, = _TRAILER.unpack_from(data, triples_end)
+    if crc != zlib.crc32(triple_bytes, zlib.crc32(term_table)):
+        return None
+
+    terms = [_decode_term(*t) for t in json.loads(term_table.decode('utf-8'))]
+    triple_ids = array('I')
+    triple_ids.frombytes(triple_bytes)
+    if sys.byteorder != 'little':
+        triple_ids.byteswap()
+
+    graph = rdflib.Graph()
+    graph.addN((terms[triple_ids[i]], terms[triple_ids[i + 1]], terms[triple_ids[i + 2]], graph)
+               for i in range(0, len(triple_ids), 3))
+    return graph
+
+
+def load_graph(nt_path):
+    """
+    load an ontology, from its snapshot when the snapshot is
+    fresh, falling back to parsing the N-Triples otherwise.
+    :param nt_path: path of the N-Triples file
+    :return: rdflib graph
+    """
+    graph = load_snapshot(nt_path)
+    if graph is None:
+        graph = rdflib.Graph()
+        graph.parse(nt_path, format='nt')
+    return graph
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# connect / read timeouts in seconds for every wiki request
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+
+# retry policy for throttled or failing requests
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5  # sleeps 0.5, 1, 2, 4... seconds between attempts
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# keep-alive connections kept open per host
+POOL_SIZE = 32
+
+USER_AGENT = "Country_ontology_and_queries crawler (python-requests)"
+
+# default location of the on-disk page cache
+DEFAULT_CACHE_DIR = ".wiki_cache"
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+
+
+class FetchError(Exception):
+    """
+    raised when a page could not be downloaded, or is missing
+    the element the crawler needs from it.
+    """
+    pass
+
+
+def make_session(pool_size=POOL_SIZE):
+    """
+    create a requests session with pooled keep-alive
+    connections and exponential backoff retries on
+    429 / 5xx responses (honoring Retry-After).
+    :param pool_size: max connections kept per host
+    :return: requests.Session
+    """
+    retry = Retry(total=MAX_RETRIES,
+                  backoff_factor=BACKOFF_FACTOR,
+                  status_forcelist=RETRY_STATUSES,
+                  allowed_methods=frozenset(['GET', 'HEAD']),
+                  respect_retry_after_header=True,
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """
+    return the session shared by all crawler functions,
+    creating it on first use.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = make_session()
+    return _session
+
+
+class PageCache:
+    """
+    persistent content addressed page cache. Bodies are stored
+    once per sha256 of their content under bodies/, and each url
+    has a small json entry under urls/ holding the body hash and
+    the ETag / Last-Modified validators of the cached response.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, offline=False):
+        self.cache_dir = cache_dir
+        self.offline = offline
+        os.makedirs(os.path.join(cache_dir, 'bodies'), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, 'urls'), exist_ok=True)
+
+    def _url_path(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, 'urls', key + '.json')
+
+    def _body_path(self, body_hash):
+        return os.path.join(self.cache_dir, 'bodies', body_hash[:2], body_hash)
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as out:
+            out.write(data)
+        os.replace(tmp_path, path)
+
+    def lookup(self, url):
+        """
+        :param url: full url of the page
+        :return: (entry dict, body bytes) or (None, None) if not cached
+        """
+        try:
+            with open(self._url_path(url), 'r') as f:
+                entry = json.load(f)
+            with open(self._body_path(entry['body_hash']), 'rb') as f:
+                return entry, f.read()
+        except (OSError, ValueError, KeyError):
+            return None, None
+
+    def store(self, url, body, etag=None, last_modified=None):
+        """
+        save a page body and its validators.
+        :return: the stored url entry
+        """
+        body_hash = hashlib.sha256(body).hexdigest()
+        body_path = self._body_path(body_hash)
+        if not os.path.isfile(body_path):
+            self._write_atomic(body_path, body)
+        entry = {'url': url,
+                 'body_hash': body_hash,
+                 'etag': etag,
+                 'last_modified': last_modified}
+        self._write_atomic(self._url_path(url), json.dumps(entry).encode('utf-8'))
+        return entry
+
+
+def configure_cache(cache_dir=DEFAULT_CACHE_DIR, offline=False):
+    """
+    enable the on-disk page cache for every following fetch.
+    :param cache_dir: directory of the cache, None disables caching
+    :param offline: only serve pages from the cache, never download
+    """
+    global _cache
+    _cache = PageCache(cache_dir, offline) if cache_dir else None
+
+
+def _get(url, headers=None):
+    try:
+        res = get_session().get(url, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        if res.status_code != 304:
+            res.raise_for_status()
+    except requests.RequestException as e:
+        raise FetchError("failed fetching {}: {}".format(url, e)) from e
+    return res
+
+
+def fetch(url):
+    """
+    download a page through the shared session. When the page
+    cache is enabled, a cached page is revalidated with a
+    conditional request and reused on 304 Not Modified; in
+    offline mode it is returned without any request.
+    :param url: full url of the page
+    :return: page content (bytes)
+    """
+    if _cache is None:
+        return _get(url).content
+
+    entry, body = _cache.lookup(url)
+    if _cache.offline:
+        if body is None:
+            raise FetchError("not in page cache (offline): " + url)
+        return body
+
+    headers = {}
+    if entry is not None:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    res = _get(url, headers)
+    if res.status_code == 304 and body is not None:
+        return body
+
+    _cache.store(url, res.content, res.headers.get('ETag'), res.headers.get('Last-Modified'))
+    return res.content